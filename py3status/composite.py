@@ -5,12 +5,14 @@ except NameError:
     basestring = str
 
 
-class Composite:
+class Composite(object):
     """
     Helper class to identify a composite and store its content
     A Composite is essentially a wrapped list containing response items.
     """
 
+    __slots__ = ['_content']
+
     def __init__(self, content=None):
         # try and create a composite from various input types
         if content is None:
@@ -77,31 +79,44 @@ class Composite:
         """
         return self._content
 
-    def simplify(self):
+    def simplify(self, copy=True):
         """
         Simplify the content of a Composite merging any parts that can be
         and returning the new Composite as well as updating itself internally
+
+        The items are copied as they may be changed, if they are not used
+        elsewhere copy can be False to avoid this.
         """
         final_output = []
-        diff_last = None
         item_last = None
         for item in self._content:
             # ignore empty items
             if not item.get('full_text') and not item.get('separator'):
                 continue
             # merge items if we can
-            diff = item.copy()
-            del diff['full_text']
-
-            if diff == diff_last or (item['full_text'].strip() == '' and item_last):
+            if item_last is not None and (
+                item['full_text'].strip() == '' or
+                self._same_but_text(item, item_last)
+            ):
                 item_last['full_text'] += item['full_text']
             else:
-                diff_last = diff
-                item_last = item.copy()  # copy item as we may change it
+                item_last = item.copy() if copy else item
                 final_output.append(item_last)
         self._content = final_output
         return self
 
+    @staticmethod
+    def _same_but_text(item, other):
+        """
+        Check if two items are the same apart from their full_text.
+        """
+        if len(item) != len(other):
+            return False
+        for key, value in item.items():
+            if key != 'full_text' and (key not in other or other[key] != value):
+                return False
+        return True
+
     @staticmethod
     def composite_join(separator, items):
         """
@@ -128,9 +143,11 @@ class Composite:
         update_dict.  Updates can be soft in which case existing values are not
         overwritten.
 
-        If item is of type string it is first converted to a Composite
+        If item is of type string it is first converted to a Composite, a
+        Composite is updated in place
         """
-        item = Composite(item)
+        if not isinstance(item, Composite):
+            item = Composite(item)
 
         for part in item.get_content():
             if soft:
@@ -9,26 +9,32 @@ import time
 from collections import deque
 from json import dumps
 from platform import python_version
-from pprint import pformat
-from signal import signal, SIGTERM, SIGUSR1, SIGTSTP, SIGCONT
+from signal import signal, SIGHUP, SIGTERM, SIGUSR1, SIGUSR2, SIGTSTP, SIGCONT
 from subprocess import Popen
-from threading import Event
+from threading import Condition, Event, Lock
 from syslog import syslog, LOG_ERR, LOG_INFO, LOG_WARNING
-from traceback import extract_tb, format_tb, format_stack
 
-import py3status.docstrings as docstrings
 from py3status.events import Events
+from py3status.formatter import Formatter, FORMAT_CACHE_SIZE
 from py3status.helpers import print_line, print_stderr
 from py3status.i3status import I3status
 from py3status.parse_config import process_config
+from py3status.metrics import Metrics
 from py3status.module import Module
-from py3status.profiling import profile
+from py3status.profiling import Profiler
+from py3status.scheduler import Scheduler, WAKEUP_SLACK, WORKERS
 from py3status.version import version
 
 LOG_LEVELS = {'error': LOG_ERR, 'warning': LOG_WARNING, 'info': LOG_INFO, }
 
 DBUS_LEVELS = {'error': 'critical', 'warning': 'normal', 'info': 'low', }
 
+# minimum time in seconds between outputs to i3bar
+OUTPUT_MIN_INTERVAL = 0.1
+
+# time in seconds between the first runs of each module at startup
+STARTUP_STAGGER = 0.01
+
 CONFIG_SPECIAL_SECTIONS = [
     '.group_extras',
     '.module_groups',
@@ -63,16 +69,25 @@ class Py3statusWrapper():
         Useful variables we'll need.
         """
         self.config = {}
+        self.event_loop = None
+        self.event_loop_lock = Lock()
         self.i3bar_running = True
+        self.include_paths_index = {}
         self.last_refresh_ts = time.time()
         self.lock = Event()
+        self.metrics = Metrics(self)
         self.modules = {}
         self.none_setting = NoneSetting()
         self.notified_messages = set()
+        self.output_cache = {}
         self.output_modules = {}
+        self.profiler = Profiler(self)
         self.py3_modules = []
         self.py3_modules_initialized = False
+        self.start_time = time.time()
         self.queue = deque()
+        self.reload_requested = False
+        self.update_condition = Condition()
 
     def get_config(self):
         """
@@ -218,9 +233,7 @@ class Py3statusWrapper():
             include_path = os.path.abspath(include_path) + '/'
             if not os.path.isdir(include_path):
                 continue
-            for f_name in sorted(os.listdir(include_path)):
-                if not f_name.endswith('.py'):
-                    continue
+            for f_name in self.get_include_path_files(include_path):
                 module_name = f_name[:-3]
                 # do not overwrite modules if already found
                 if module_name in user_modules:
@@ -228,6 +241,21 @@ class Py3statusWrapper():
                 user_modules[module_name] = (include_path, f_name)
         return user_modules
 
+    def get_include_path_files(self, include_path):
+        """
+        Return the sorted python files in the include directory.  The listing
+        is only redone if the modification time of the directory changes.
+        """
+        mtime = os.stat(include_path).st_mtime
+        index = self.include_paths_index.get(include_path)
+        if not index or index[0] != mtime:
+            files = sorted(
+                f_name for f_name in os.listdir(include_path)
+                if f_name.endswith('.py')
+            )
+            index = self.include_paths_index[include_path] = (mtime, files)
+        return index[1]
+
     def get_user_configured_modules(self):
         """
         Get a dict of all available and configured py3status modules
@@ -259,8 +287,9 @@ class Py3statusWrapper():
                 continue
             try:
                 my_m = Module(module, user_modules, self)
-                # only handle modules with available methods
-                if my_m.methods:
+                # only handle modules with available methods, lazily loaded
+                # modules are checked once they are loaded.
+                if my_m.methods or my_m.lazy:
                     self.modules[module] = my_m
                 elif self.config['debug']:
                     self.log(
@@ -364,6 +393,21 @@ class Py3statusWrapper():
             sys.stdout = open('/dev/null', 'w')
             sys.stderr = open('/dev/null', 'w')
 
+        # setup the scheduler that will run our modules
+        py3status_config = self.config['py3_config']['py3status']
+        self.scheduler = Scheduler(
+            self,
+            workers=py3status_config.get('workers', WORKERS),
+            slack=py3status_config.get('wakeup_slack', WAKEUP_SLACK),
+        )
+        self.scheduler.start()
+        if self.config['debug']:
+            self.log('scheduler started')
+
+        Formatter.set_cache_size(
+            py3status_config.get('format_cache_size', FORMAT_CACHE_SIZE)
+        )
+
         # get the list of py3status configured modules
         self.py3_modules = self.config['py3_config']['py3_modules']
 
@@ -376,6 +420,24 @@ class Py3statusWrapper():
             # load and spawn i3status.conf configured modules threads
             self.load_modules(self.py3_modules, user_modules)
 
+    def get_event_loop(self):
+        """
+        Get the event loop used to run coroutine module methods.  It is only
+        started once a module needs it.
+        """
+        with self.event_loop_lock:
+            if not self.event_loop:
+                # only import if needed
+                from py3status.event_loop import EventLoop
+                self.event_loop = EventLoop(self)
+                self.event_loop.start()
+                if not self.event_loop.available:
+                    self.log('event loop not available, asyncio is needed',
+                             'warning')
+                elif self.config['debug']:
+                    self.log('event loop started')
+        return self.event_loop
+
     def notify_user(self, msg, level='error', rate_limit=None, module_name=''):
         """
         Display notification to user via i3-nagbar or send-notify
@@ -445,6 +507,10 @@ class Py3statusWrapper():
             # run kill() method on all py3status modules
             for module in self.modules.values():
                 module.kill()
+            # stop the scheduler and its workers
+            self.scheduler.stop()
+            if self.event_loop:
+                self.event_loop.stop()
         except:
             pass
 
@@ -487,6 +553,117 @@ class Py3statusWrapper():
         self.log('received USR1')
         self.refresh_modules()
 
+    def profile_handler(self, signum, frame):
+        """
+        SIGUSR2 was received, the user asks for profiling of the modules to be
+        turned on or off.
+        """
+        self.log('received USR2')
+        self.profiler.toggle()
+
+    def reload_handler(self, signum, frame):
+        """
+        SIGHUP was received, the user asks for the config to be reloaded.
+        The reload is done by the main loop.
+        """
+        self.log('received HUP')
+        self.reload_requested = True
+        with self.update_condition:
+            self.update_condition.notify()
+
+    def reload_config(self):
+        """
+        Reload the config file.  Only modules that have been added, removed or
+        whose configuration has changed are affected, other modules keep
+        running as they are.
+        """
+        start = time.time()
+        old_config = self.config['py3_config']
+        # the config file may be missing whilst an editor is saving it, if it
+        # cannot be read we carry on as we are
+        try:
+            new_config = process_config(
+                self.config['i3status_config_path'], self
+            )
+        except Exception:
+            self.report_exception(
+                'Config could not be reloaded, keeping the current config'
+            )
+            return
+
+        # the general and py3status sections can affect any module
+        global_change = (
+            old_config['general'] != new_config['general'] or
+            old_config['py3status'] != new_config['py3status']
+        )
+        old_modules = set(old_config['py3_modules'])
+        new_modules = set(new_config['py3_modules'])
+        added = new_modules - old_modules
+        removed = old_modules - new_modules
+        changed = set(
+            name for name in old_modules & new_modules
+            if global_change or old_config[name] != new_config[name]
+        )
+
+        # stop modules that have been removed or changed
+        for name in removed | changed:
+            module = self.modules.pop(name, None)
+            if module:
+                module.kill()
+            self.metrics.remove(name)
+            self.output_modules.pop(name, None)
+            self.output_cache.pop(name, None)
+
+        self.config['py3_config'] = new_config
+        self.py3_modules = new_config['py3_modules']
+        self.events_thread.update_config(new_config)
+        self.create_mappings(new_config)
+        Formatter.set_cache_size(
+            new_config['py3status'].get('format_cache_size', FORMAT_CACHE_SIZE)
+        )
+        self.scheduler.configure(
+            workers=new_config['py3status'].get('workers', WORKERS),
+            slack=new_config['py3status'].get('wakeup_slack', WAKEUP_SLACK),
+        )
+
+        # i3status only needs restarting if its config has changed
+        i3status_changed = (
+            old_config['general'] != new_config['general'] or
+            old_config['i3s_modules'] != new_config['i3s_modules'] or
+            any(old_config.get(name) != new_config.get(name)
+                for name in new_config['i3s_modules'])
+        )
+        if i3status_changed:
+            for name in old_config['i3s_modules']:
+                self.output_modules.pop(name, None)
+                self.output_cache.pop(name, None)
+            if not self.i3status_thread.mocked:
+                self.i3status_thread.restart()
+            elif new_config['i3s_modules'] and not self.config['standalone']:
+                self.notify_user(
+                    'i3status modules will be shown once py3status restarts.',
+                    level='warning'
+                )
+
+        # start added and changed modules
+        to_load = [x for x in self.py3_modules if x in added | changed]
+        self.load_modules(to_load, self.get_user_configured_modules())
+        self.create_output_modules()
+        for index, name in enumerate(to_load):
+            if name in self.modules:
+                self.modules[name].start_module(delay=index * STARTUP_STAGGER)
+
+        # everything needs to be output again as positions may have changed
+        with self.update_condition:
+            self.queue.extend(self.output_modules)
+
+        msg = 'config reloaded in {:.3f}s: {} added, {} removed, {} changed'
+        self.log(msg.format(
+            time.time() - start, len(added), len(removed), len(changed)
+        ))
+        if i3status_changed:
+            self.log('i3status restarted')
+
     def terminate(self, signum, frame):
         """
         Received request to terminate (SIGTERM), exit nicely.
@@ -514,7 +691,10 @@ class Py3statusWrapper():
         """
         if not isinstance(update, list):
             update = [update]
-        self.queue.extend(update)
+        # add to the queue and wake the main loop
+        with self.update_condition:
+            self.queue.extend(update)
+            self.update_condition.notify()
 
         # if all our py3status modules are not ready to receive updates then we
         # don't want to get them to update.
@@ -525,6 +705,10 @@ class Py3statusWrapper():
         containers = self.config['py3_config']['.module_groups']
         containers_to_update = set()
         for item in update:
+            # a container updating may have changed what it is displaying
+            module = self.modules.get(item)
+            if module and module.container:
+                self.unsuspend_visible_modules(item)
             if item in containers:
                 containers_to_update.update(set(containers[item]))
         # force containers to update
@@ -546,6 +730,38 @@ class Py3statusWrapper():
                     # we don't know so just update.
                     container_module['module'].force_update()
 
+    def is_module_visible(self, module_name):
+        """
+        Check if the named module is being displayed.  A module is not visible
+        if a container holding it has a content_function that does not include
+        it, or if the container is itself not visible.
+        """
+        containers = self.config['py3_config']['.module_groups']
+        for container in containers.get(module_name, []):
+            container_module = self.output_modules.get(container)
+            if not container_module:
+                continue
+            content_function = container_module.get('content_function')
+            if content_function and module_name not in content_function():
+                return False
+            if not self.is_module_visible(container):
+                return False
+        return True
+
+    def unsuspend_visible_modules(self, container):
+        """
+        Unsuspend any suspended modules held by the container that are now
+        visible.  This includes modules held in any contained containers.
+        """
+        module_groups = self.config['py3_config']['.module_groups']
+        for name, containers in module_groups.items():
+            if container not in containers:
+                continue
+            module = self.modules.get(name)
+            if module and self.is_module_visible(name):
+                module.unsuspend()
+                self.unsuspend_visible_modules(name)
+
     def log(self, msg, level='info'):
         """
         log this information to syslog or user provided logfile.
@@ -560,6 +776,7 @@ class Py3statusWrapper():
                 log_time = time.strftime("%Y-%m-%d %H:%M:%S")
                 # nice formating of data structures using pretty print
                 if isinstance(msg, (dict, list, set, tuple)):
+                    from pprint import pformat
                     msg = pformat(msg)
                     # if multiline then start the data output on a fresh line
                     # to aid readability.
@@ -590,6 +807,9 @@ class Py3statusWrapper():
 
         NOTE: msg should not end in a '.' for consistency.
         """
+        # only imported when needed to keep startup fast
+        from traceback import extract_tb, format_tb, format_stack
+
         # Get list of paths that our stack trace should be found in.
         py3_paths = [os.path.dirname(__file__)]
         user_paths = self.config['include_paths']
@@ -662,16 +882,17 @@ class Py3statusWrapper():
         for name in self.modules:
             if name not in output_modules:
                 output_modules[name] = {}
-                output_modules[name]['position'] = positions.get(name, [])
                 output_modules[name]['module'] = self.modules[name]
                 output_modules[name]['type'] = 'py3status'
-        # i3status modules
-        for name in i3modules:
+        # i3status modules, these can be added by the i3status thread
+        for name, module in list(i3modules.items()):
             if name not in output_modules:
                 output_modules[name] = {}
-                output_modules[name]['position'] = positions.get(name, [])
-                output_modules[name]['module'] = i3modules[name]
+                output_modules[name]['module'] = module
                 output_modules[name]['type'] = 'i3status'
+        # positions may have changed if the config has been reloaded
+        for name in output_modules:
+            output_modules[name]['position'] = positions.get(name, [])
 
         self.output_modules = output_modules
 
@@ -717,23 +938,38 @@ class Py3statusWrapper():
         # Store mappings for later use.
         self.mappings_color = mappings
 
-    def process_module_output(self, outputs):
+    def process_module_output(self, module_name, outputs):
         """
         Process the output for a module and return a json string representing it.
         Color processing occurs here.
+
+        The json string is cached and only recreated if the module's output
+        has changed since it was last processed.
         """
+        cached = self.output_cache.get(module_name)
+        if cached and cached[0] == outputs:
+            return cached[1]
+        items = []
         for output in outputs:
             # Color: substitute the config defined color
             if 'color' not in output:
                 # Get the module name from the output.
-                module_name = '{} {}'.format(
+                module_name_output = '{} {}'.format(
                     output['name'], output.get('instance', '').split(' ')[0]
                 ).strip()
-                color = self.mappings_color.get(module_name)
+                color = self.mappings_color.get(module_name_output)
                 if color:
+                    # copy so the module's own output is left unchanged
+                    output = output.copy()
                     output['color'] = color
+            items.append(output)
         # Create the json string output.
-        return ','.join([dumps(x) for x in outputs])
+        fragment = ','.join([dumps(x) for x in items])
+        # store a copy of the output as modules may alter their output in place
+        self.output_cache[module_name] = (
+            [x.copy() for x in outputs], fragment
+        )
+        return fragment
 
     def i3bar_stop(self, signum, frame):
         self.i3bar_running = False
@@ -744,6 +980,9 @@ class Py3statusWrapper():
     def i3bar_start(self, signum, frame):
         self.i3bar_running = True
         self.wake_modules()
+        # let the main loop know that output can resume
+        with self.update_condition:
+            self.update_condition.notify()
 
     def sleep_modules(self):
         # Put all py3modules to sleep so they stop updating
@@ -757,7 +996,6 @@ class Py3statusWrapper():
             if module['type'] == 'py3status':
                 module['module'].wake()
 
-    @profile
     def run(self):
         """
         Main py3status loop, continuously read from i3status and modules
@@ -767,6 +1005,10 @@ class Py3statusWrapper():
         # this mimics the USR1 signal handling of i3status (see man i3status)
         signal(SIGUSR1, self.sig_handler)
         signal(SIGTERM, self.terminate)
+        # SIGHUP reloads the config
+        signal(SIGHUP, self.reload_handler)
+        # SIGUSR2 turns profiling of modules on and off
+        signal(SIGUSR2, self.profile_handler)
 
         # initialize usage variables
         i3status_thread = self.i3status_thread
@@ -780,24 +1022,30 @@ class Py3statusWrapper():
         # content_function.
         self.create_output_modules()
 
-        # Some modules need to be prepared before they can run
-        # eg run their post_config_hook
-        for module in self.modules.values():
-            module.prepare_module()
-
         # modules can now receive updates
         self.py3_modules_initialized = True
 
-        # start modules
-        for module in self.modules.values():
-            module.start_module()
+        # start modules.  Modules are prepared eg run their post_config_hook
+        # by the scheduler's workers so that a slow module does not hold up
+        # the others.  The first runs are staggered so that the modules do
+        # not all update at the same moment.
+        for index, module in enumerate(self.modules.values()):
+            module.start_module(delay=index * STARTUP_STAGGER)
 
         # this will be our output set to the correct length for the number of
         # items in the bar
         output = [None] * len(py3_config['order'])
 
         interval = self.config['interval']
-        last_sec = 0
+        # time of our next once a second checks
+        check_due = 0
+
+        # updates arriving within output_min_interval of the last output are
+        # collected together and written as a single frame.
+        output_min_interval = py3_config['py3status'].get(
+            'output_min_interval', OUTPUT_MIN_INTERVAL)
+        output_due = 0
+        last_output = None
 
         # start our output
         header = {
@@ -810,19 +1058,37 @@ class Py3statusWrapper():
 
         # main loop
         while True:
-            # sleep a bit to avoid killing the CPU
-            # by doing this at the begining rather than the end
-            # of the loop we ensure a smoother first render of the i3bar
-            time.sleep(0.1)
+            # wait until we have an update to output or until our checks are
+            # due.  We always use a timeout so that signals get handled.
+            with self.update_condition:
+                while True:
+                    due = check_due
+                    if self.queue and self.i3bar_running:
+                        due = min(due, output_due)
+                    timeout = due - time.time()
+                    if timeout <= 0:
+                        break
+                    self.update_condition.wait(timeout)
 
-            while not self.i3bar_running:
-                time.sleep(0.1)
+            # reload the config if requested
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload_config()
+                py3_config = self.config['py3_config']
+                output = [None] * len(py3_config['order'])
+                output_min_interval = py3_config['py3status'].get(
+                    'output_min_interval', OUTPUT_MIN_INTERVAL)
 
-            sec = int(time.time())
+            now = time.time()
 
             # only check everything is good each second
-            if sec > last_sec:
-                last_sec = sec
+            if now >= check_due:
+                sec = int(now)
+                check_due = sec + 1
+
+                # nothing to check whilst i3bar has stopped our output
+                if not self.i3bar_running:
+                    continue
 
                 # check i3status thread
                 if not i3status_thread.is_alive():
@@ -844,23 +1110,43 @@ class Py3statusWrapper():
                     i3status_thread.update_times()
 
             # check if an update is needed
-            if self.queue:
+            now = time.time()
+            if self.queue and self.i3bar_running and now >= output_due:
+                output_due = now + output_min_interval
                 while (len(self.queue)):
                     module_name = self.queue.popleft()
-                    module = self.output_modules[module_name]
+                    module = self.output_modules.get(module_name)
+                    if not module:
+                        # i3status modules are only known once i3status has
+                        # output them, this can happen after a reload.
+                        self.create_output_modules()
+                        module = self.output_modules.get(module_name)
+                    if not module or not module['position']:
+                        continue
+                    # store the output as json
+                    out = self.process_module_output(
+                        module_name, module['module'].get_latest()
+                    )
                     for index in module['position']:
-                        # store the output as json
-                        out = module['module'].get_latest()
-                        output[index] = self.process_module_output(out)
+                        output[index] = out
 
                 # build output string
                 out = ','.join([x for x in output if x])
-                # dump the line to stdout
-                print_line(',[{}]'.format(out))
+                # dump the line to stdout if it has changed
+                if out != last_output:
+                    if last_output is None:
+                        self.log('first output after {:.3f}s'.format(
+                            time.time() - self.start_time
+                        ))
+                    last_output = out
+                    print_line(',[{}]'.format(out))
 
     def handle_cli_command(self, config):
         """Handle a command from the CLI.
         """
+        # the cli commands are not needed when running the bar
+        import py3status.docstrings as docstrings
+
         cmd = config['cli_command']
         # aliases
         if cmd[0] in ['mod', 'module', 'modules']:
@@ -0,0 +1,215 @@
+"""
+Support for modules with coroutine (async def) methods.
+
+This is only imported if a module has coroutine methods.  Coroutine methods
+need python 3.5+, on older pythons the EventLoop is not available.  The
+callback style is used rather than async/await so that the file can still be
+byte compiled by older pythons.
+"""
+from subprocess import PIPE
+from threading import Thread
+
+try:
+    # Python 3.4+
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+class CoroutineTimeout(Exception):
+    """
+    A coroutine did not complete within the timeout.
+    """
+
+
+class CoroutineRun:
+    """
+    A set of coroutines being run on the event loop.
+    """
+
+    def __init__(self, loop, coroutines, callback, timeout=None):
+        self.callback = callback
+        self.cancelled = False
+        self.coroutines = coroutines
+        self.future = None
+        self.loop = loop
+        self.tasks = []
+        self.timed_out = False
+        self.timeout = timeout
+        self.timer = None
+
+    def start(self):
+        """
+        Start the coroutines on the event loop.
+        """
+        self.loop.call_soon_threadsafe(
+            self._start, self.coroutines, self.callback
+        )
+
+    def _start(self, coroutines, callback):
+        if self.cancelled:
+            # prevent never awaited warnings
+            for coroutine in coroutines:
+                coroutine.close()
+            return
+        self.tasks = [self.loop.create_task(x) for x in coroutines]
+        self.future = asyncio.gather(*self.tasks, return_exceptions=True)
+        if self.timeout is not None:
+            self.timer = self.loop.call_later(self.timeout, self._timed_out)
+
+        def done(future):
+            if self.timer:
+                self.timer.cancel()
+            if future.cancelled():
+                return
+            results = future.result()
+            if self.timed_out:
+                # the coroutines we cancelled give a CoroutineTimeout
+                results = [
+                    CoroutineTimeout('timed out after {}s'.format(self.timeout))
+                    if isinstance(x, asyncio.CancelledError) else x
+                    for x in results
+                ]
+            callback(results)
+
+        self.future.add_done_callback(done)
+
+    def _timed_out(self):
+        self.timed_out = True
+        for task in self.tasks:
+            task.cancel()
+
+    def _cancel(self):
+        self.cancelled = True
+        if self.timer:
+            self.timer.cancel()
+        if self.future:
+            self.future.cancel()
+
+    def cancel(self):
+        """
+        Cancel the coroutines.  The callback will not be called.
+        """
+        self.loop.call_soon_threadsafe(self._cancel)
+
+
+class EventLoop(Thread):
+    """
+    This class runs the asyncio event loop shared by all modules that have
+    coroutine methods.  Modules waiting on network or subprocess I/O do not
+    tie up a worker thread.
+
+    Without asyncio there is no event loop to run and available is False.
+    """
+
+    available = asyncio is not None
+
+    def __init__(self, py3_wrapper):
+        Thread.__init__(self)
+        self.daemon = True
+        self.loop = None
+        if self.available:
+            self.loop = asyncio.new_event_loop()
+        self.py3_wrapper = py3_wrapper
+
+    def start(self):
+        """
+        Start the event loop thread if there is an event loop to run.
+        """
+        if self.available:
+            Thread.start(self)
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def stop(self):
+        """
+        Stop the event loop.
+        """
+        if self.available:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+
+    def run_coroutines(self, coroutines, callback, timeout=None, start=True):
+        """
+        Run the coroutines on the event loop.  Once they have all completed
+        callback is called, from the event loop thread, with a list of their
+        results.  Any exceptions raised are given in place of the result.
+
+        If timeout is given then any coroutines still running after that many
+        seconds are cancelled and give a CoroutineTimeout as their result.
+
+        If start is False the coroutines are only run once the start() method
+        of the returned CoroutineRun is called.  The caller can then store the
+        run before the callback could be called.
+
+        Returns a CoroutineRun which can be used to cancel the coroutines.
+        """
+        run = CoroutineRun(self.loop, coroutines, callback, timeout)
+        if start:
+            run.start()
+        return run
+
+    def run_in_executor(self, function):
+        """
+        Run a blocking function in a separate thread.  Returns an awaitable.
+        Must be called from the event loop thread.
+        """
+        return self.loop.run_in_executor(None, function)
+
+    def command_output(self, command, shell, check):
+        """
+        Run a command as a subprocess.  Returns an awaitable giving the
+        result of check(output, error, returncode).  Must be called from the
+        event loop thread.
+        """
+        loop = self.loop
+        try:
+            result = loop.create_future()
+        except AttributeError:
+            # Python < 3.5.2
+            result = asyncio.Future(loop=loop)
+        if shell:
+            start = asyncio.create_subprocess_shell(
+                command, stdout=PIPE, stderr=PIPE
+            )
+        else:
+            start = asyncio.create_subprocess_exec(
+                *command, stdout=PIPE, stderr=PIPE
+            )
+
+        def finished(task, process):
+            if result.cancelled():
+                return
+            try:
+                output, error = task.result()
+                output = output.decode('utf-8')
+                error = error.decode('utf-8')
+                result.set_result(check(output, error, process.returncode))
+            except Exception as e:
+                result.set_exception(e)
+
+        def started(task):
+            if result.cancelled():
+                return
+            try:
+                process = task.result()
+            except Exception as e:
+                msg = "Command '{cmd}' {error}"
+                cmd = command if shell else command[0]
+                result.set_exception(Exception(msg.format(cmd=cmd, error=e)))
+                return
+
+            def cancelled(future):
+                # kill the process if the caller has been cancelled
+                if future.cancelled() and process.returncode is None:
+                    process.kill()
+
+            result.add_done_callback(cancelled)
+            communicate = loop.create_task(process.communicate())
+            communicate.add_done_callback(
+                lambda task: finished(task, process)
+            )
+
+        loop.create_task(start).add_done_callback(started)
+        return result
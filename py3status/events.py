@@ -5,7 +5,6 @@ from threading import Thread
 from subprocess import Popen, PIPE
 from json import loads
 
-from py3status.profiling import profile
 
 try:
     # Python 3
@@ -70,6 +69,13 @@ class Events(Thread):
         self.poller_inp = IOPoller(sys.stdin)
         self.py3_wrapper = py3_wrapper
 
+    def update_config(self, py3_config):
+        """
+        Use the new config after it has been reloaded.
+        """
+        self.py3_config = py3_config
+        self.on_click = py3_config['on_click']
+
     def get_module_text(self, module_name, event):
         """
         Get the full text for the module as well as the partial text if the
@@ -109,6 +115,10 @@ class Events(Thread):
             self.py3_wrapper.refresh_modules()
         elif command == 'refresh':
             self.py3_wrapper.refresh_modules(module_name)
+        elif command == 'profile':
+            self.py3_wrapper.profiler.toggle()
+        elif command == 'dump_metrics':
+            self.py3_wrapper.metrics.dump()
         else:
             # In commands we are able to use substitutions for the text output
             # of a module
@@ -223,7 +233,6 @@ class Events(Thread):
         # do the work
         self.process_event(module_name, event)
 
-    @profile
     def run(self):
         """
         Wait for an i3bar JSON event, then find the right module to dispatch
@@ -2,6 +2,9 @@
 import re
 import sys
 
+from collections import OrderedDict
+from threading import Lock
+
 from py3status.composite import Composite
 
 try:
@@ -9,29 +12,126 @@ try:
 except ImportError:
     from urlparse import parse_qsl
 
+# operations of a compiled format string
+OP_LITERAL = 0
+OP_PLACEHOLDER = 1
+OP_BLOCK_START = 2
+OP_BLOCK_END = 3
+OP_SWITCH = 4
+OP_COMMAND = 5
+
+# default number of format strings whose tokens and operations are cached
+FORMAT_CACHE_SIZE = 500
+# number of outputs memoized for each module
+FORMAT_MEMO_SIZE = 32
+
+# marks a placeholder that is neither in the param_dict nor the module
+MISSING = object()
+
 
-class BlockConfig:
+class FormatCache:
     """
-    Block commands eg [\?color=bad ...] are stored in this object
+    Least recently used cache of format strings.  Once it holds size items
+    the least recently used one is dropped when another is added.
     """
 
-    REGEX_COLOR = re.compile('#[0-9A-F]{6}')
+    python2 = sys.version_info < (3, 0)
+
+    def __init__(self, size=FORMAT_CACHE_SIZE):
+        self.cache = OrderedDict()
+        self.lock = Lock()
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get(self, key):
+        """
+        Get the cached value or None if it is not cached.
+        """
+        with self.lock:
+            value = self.cache.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            # move to the most recently used end
+            if self.python2:
+                del self.cache[key]
+                self.cache[key] = value
+            else:
+                self.cache.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.cache.pop(key, None)
+            self.cache[key] = value
+            self._evict()
 
-    # defaults
-    _if = None
-    color = None
-    has_commands = False
-    max_length = None
-    min_length = 0
-    not_zero = False
-    show = False
+    def reset_lock(self):
+        """
+        Replace the lock, used in a forked process as the lock may have been
+        held by another thread when we were forked.
+        """
+        self.lock = Lock()
 
-    def update_commands(self, commands_str):
+    def resize(self, size):
+        with self.lock:
+            self.size = size
+            self._evict()
+
+    def _evict(self):
         """
-        update with commands from the block
+        Drop the least recently used items over our size.  The lock must be
+        held.
         """
-        commands = dict(parse_qsl(commands_str, keep_blank_values=True))
+        while len(self.cache) > self.size:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'evictions': self.evictions,
+                'hit_rate': self.hits / float(lookups) if lookups else 0,
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self.cache),
+                'max_size': self.size,
+            }
+
+
+class BlockConfig(object):
+    """
+    Block commands eg [\?color=bad ...] are stored in this object
+    """
+
+    __slots__ = [
+        '_if', 'color', 'has_commands', 'max_length', 'min_length',
+        'not_zero', 'show',
+    ]
+
+    REGEX_COLOR = re.compile('#[0-9A-F]{6}')
 
+    def __init__(self):
+        # defaults
+        self._if = None
+        self.color = None
+        self.has_commands = False
+        self.max_length = None
+        self.min_length = 0
+        self.not_zero = False
+        self.show = False
+
+    def update_commands(self, commands):
+        """
+        update with a dict of commands from the block
+        """
         self._if = commands.get('if', self._if)
         self.color = self._check_color(commands.get('color'))
         self._set_int(commands, 'max_length')
@@ -68,7 +168,7 @@ class BlockConfig:
         return color
 
 
-class Block:
+class Block(object):
     """
     Represents a block of our format.  Block being contained inside [..]
 
@@ -77,9 +177,13 @@ class Block:
     know about their parent block (if they have one)
     """
 
+    __slots__ = [
+        'block_config', 'content', 'module', 'options', 'param_dict',
+        'parent', 'valid_blocks',
+    ]
+
     def __init__(self, param_dict, module, parent=None):
         self.block_config = BlockConfig()
-        self.commands = {}
         self.content = []
         self.module = module
         self.options = []
@@ -115,8 +219,7 @@ class Block:
 
     def set_commands(self, commands):
         """
-        Process any commands into a dict and store
-        commands are url query string encoded
+        Store the commands, these have already been parsed into a dict
         """
         self.block_config.update_commands(commands)
 
@@ -223,19 +326,157 @@ class Formatter:
     python2 = sys.version_info < (3, 0)
     reg_ex = re.compile(TOKENS[0], re.M | re.I)
 
-    format_string_cache = {}
+    format_string_cache = FormatCache()
+    compiled_cache = FormatCache()
+    dependencies_cache = FormatCache()
+
+    @classmethod
+    def set_cache_size(cls, size):
+        """
+        Set the number of format strings that are cached.
+        """
+        cls.format_string_cache.resize(size)
+        cls.compiled_cache.resize(size)
+        cls.dependencies_cache.resize(size)
+
+    @classmethod
+    def reset_locks(cls):
+        """
+        Replace the locks of the format string caches.
+        """
+        cls.format_string_cache.reset_lock()
+        cls.compiled_cache.reset_lock()
+        cls.dependencies_cache.reset_lock()
+
+    @classmethod
+    def cache_stats(cls):
+        """
+        Get the hits, misses and evictions of the format string caches.
+        """
+        return {
+            'compiled': cls.compiled_cache.stats(),
+            'dependencies': cls.dependencies_cache.stats(),
+            'tokens': cls.format_string_cache.stats(),
+        }
 
     def tokens(self, format_string):
         """
         Get the tokenized format_string.
         Tokenizing is resource intensive so we only do it once and cache it
         """
-        if format_string not in self.format_string_cache:
+        tokens = self.format_string_cache.get(format_string)
+        if tokens is None:
             if self.python2 and isinstance(format_string, str):
                 format_string = format_string.decode('utf-8')
             tokens = list(re.finditer(self.reg_ex, format_string))
-            self.format_string_cache[format_string] = tokens
-        return self.format_string_cache[format_string]
+            self.format_string_cache.set(format_string, tokens)
+        return tokens
+
+    def compile(self, format_string):
+        """
+        Get the format_string compiled into a list of operations.  Each
+        operation is a tuple starting with its OP_* code.  Everything that
+        does not depend on the values being formatted is worked out here so
+        that format() only needs to look up the values.  The compiled
+        operations are cached.
+        """
+        program = self.compiled_cache.get(format_string)
+        if program is not None:
+            return program
+        program = []
+        depth = 0
+        for token in self.tokens(format_string):
+            value = token.group(0)
+            if token.group('block_start'):
+                depth += 1
+                program.append((OP_BLOCK_START,))
+            elif token.group('block_end'):
+                if not depth:
+                    raise Exception('Too many `]`')
+                depth -= 1
+                program.append((OP_BLOCK_END,))
+            elif token.group('switch'):
+                program.append((OP_SWITCH,))
+            elif token.group('placeholder'):
+                program.append((
+                    OP_PLACEHOLDER, token.group('key'),
+                    token.group('format'), value
+                ))
+            elif token.group('literal'):
+                program.append((OP_LITERAL, value))
+            elif token.group('lost_brace'):
+                # due to how parsing happens we can get a lonesome }
+                # eg in format_string '{{something}' this fixes that issue
+                program.append((OP_LITERAL, value))
+            elif token.group('command'):
+                # commands are url query string encoded
+                commands = dict(
+                    parse_qsl(token.group('command'), keep_blank_values=True)
+                )
+                program.append((OP_COMMAND, commands))
+            elif token.group('escaped'):
+                # escaped characters add unescaped values
+                if value[0] in ['\\', '{', '}']:
+                    value = value[1:]
+                program.append((OP_LITERAL, value))
+        if depth:
+            raise Exception('Block not closed')
+        self.compiled_cache.set(format_string, program)
+        return program
+
+    def dependencies(self, format_string):
+        """
+        Get what the output of the format_string depends on as a tuple of
+        the placeholders, the names used by `if` commands and the module
+        attributes of the colors used by `color` commands.
+        """
+        dependencies = self.dependencies_cache.get(format_string)
+        if dependencies is not None:
+            return dependencies
+        placeholders = []
+        conditions = []
+        colors = []
+        for op in self.compile(format_string):
+            if op[0] == OP_PLACEHOLDER:
+                placeholders.append(op[1])
+            elif op[0] == OP_COMMAND:
+                if op[1].get('if'):
+                    conditions.append(op[1]['if'].lstrip('!'))
+                color = op[1].get('color')
+                if color and color[0] != '#':
+                    colors.append('color_%s' % color)
+                    colors.append('color_threshold_%s' % color)
+        dependencies = (tuple(placeholders), tuple(conditions), tuple(colors))
+        self.dependencies_cache.set(format_string, dependencies)
+        return dependencies
+
+    def memo_key(self, format_string, module, param_dict, force_composite):
+        """
+        Get the key used to memoize the output of format() from the values
+        the output depends on.  None is returned if the output cannot be
+        memoized, such as when a Composite or an unhashable value is used.
+        """
+        placeholders, conditions, colors = self.dependencies(format_string)
+        values = []
+        for key in placeholders:
+            if key in param_dict:
+                value = param_dict[key]
+                if isinstance(value, Composite):
+                    return None
+            else:
+                value = getattr(module, key, MISSING)
+            # the type is needed as eg True == 1 but they are shown differently
+            values.append((type(value), value))
+        for key in conditions:
+            values.append(bool(param_dict.get(key)))
+        for name in colors:
+            values.append(getattr(module, name, None))
+        key = (format_string, force_composite, tuple(values))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
 
     def get_placeholders(self, format_string):
         """
@@ -286,11 +527,14 @@ class Formatter:
         return u''.join(output)
 
     def format(self, format_string, module=None, param_dict=None,
-               force_composite=False, attr_getter=None):
+               force_composite=False, attr_getter=None, memo=None):
         """
         Format a string, substituting place holders which can be found in
         param_dict, attributes of the supplied module, or provided via calls to
         the attr_getter function.
+
+        memo is an optional FormatCache.  If given, outputs are stored in it
+        and reused while the values that they depend on are unchanged.
         """
 
         def set_param(param, value, key, block, format=''):
@@ -338,30 +582,31 @@ class Formatter:
         if param_dict is None:
             param_dict = {}
 
+        # reuse the output if nothing has changed since it was made, the
+        # values from an attr_getter are unknown so it cannot be used
+        memo_key = None
+        if memo is not None and attr_getter is None:
+            memo_key = self.memo_key(
+                format_string, module, param_dict, force_composite
+            )
+            if memo_key is not None:
+                output = memo.get(memo_key)
+                if isinstance(output, Composite):
+                    return output.copy()
+                elif output is not None:
+                    return output
+
         block = Block(param_dict, module)
 
-        # Tokenize the format string and process them
-        for token in self.tokens(format_string):
-            value = token.group(0)
-            if token.group('block_start'):
-                # Create new block
-                new_block = Block(param_dict, module, block)
-                block.add(new_block)
-                block = new_block
-            elif token.group('block_end'):
-                # Close block setting any valid state as needed
-                # and return to parent block to continue
-                block.set_valid_state()
-                if not block.parent:
-                    raise Exception('Too many `]`')
-                block = block.parent
-            elif token.group('switch'):
-                # a new option has been created
-                block.set_valid_state()
-                block.switch()
-            elif token.group('placeholder'):
+        # Run the compiled format string
+        for op in self.compile(format_string):
+            code = op[0]
+            if code == OP_LITERAL:
+                block.add(op[1])
+            elif code == OP_PLACEHOLDER:
                 # Found a {placeholder}
-                key = token.group('key')
+                key = op[1]
+                value = op[3]
                 if key in param_dict:
                     # was a supplied parameter
                     param = param_dict.get(key)
@@ -371,8 +616,7 @@ class Formatter:
                             block.add(param.copy())
                             block.mark_valid()
                     else:
-                        format = token.group('format')
-                        set_param(param, value, key, block, format)
+                        set_param(param, value, key, block, op[2])
                 elif module and hasattr(module, key):
                     # attribute of the module
                     param = getattr(module, key)
@@ -387,23 +631,23 @@ class Formatter:
                 else:
                     # substitution not found so add as a literal
                     block.add(value)
-            elif token.group('literal'):
-                block.add(value)
-            elif token.group('lost_brace'):
-                # due to how parsing happens we can get a lonesome }
-                # eg in format_string '{{something}' this fixes that issue
-                block.add(value)
-            elif token.group('command'):
+            elif code == OP_BLOCK_START:
+                # Create new block
+                new_block = Block(param_dict, module, block)
+                block.add(new_block)
+                block = new_block
+            elif code == OP_BLOCK_END:
+                # Close block setting any valid state as needed
+                # and return to parent block to continue
+                block.set_valid_state()
+                block = block.parent
+            elif code == OP_SWITCH:
+                # a new option has been created
+                block.set_valid_state()
+                block.switch()
+            elif code == OP_COMMAND:
                 # a block command has been found
-                block.set_commands(token.group('command'))
-            elif token.group('escaped'):
-                # escaped characters add unescaped values
-                if value[0] in ['\\', '{', '}']:
-                    value = value[1:]
-                block.add(value)
-
-        if block.parent:
-            raise Exception('Block not closed')
+                block.set_commands(op[1])
 
         # This is the main block if none of the sections are valid use the last
         # one for situations like '{placeholder}|Nothing'
@@ -432,7 +676,8 @@ class Formatter:
                         item['color'] = color_this
                 else:
                     del item['color']
-        output = Composite(output).simplify()
+        # the items were all made by us so they need not be copied
+        output = output.simplify(copy=False)
         # if only text then we can become a string
         if not force_composite:
             if len(output) == 0:
@@ -440,4 +685,10 @@ class Formatter:
             elif (len(output) == 1 and list(output[0].keys()) == ['full_text']):
                 output = output[0]['full_text']
 
+        if memo_key is not None:
+            # the caller may change the output so we keep our own copy
+            if isinstance(output, Composite):
+                memo.set(memo_key, output.copy())
+            else:
+                memo.set(memo_key, output)
         return output
@@ -1,5 +1,6 @@
 from __future__ import print_function
 
+import os
 import sys
 
 
@@ -15,3 +16,13 @@ def print_stderr(line):
     """Print line to stderr
     """
     print(line, file=sys.stderr)
+
+
+def cache_directory():
+    """
+    Directory that py3status keeps its cache and other files in.
+    """
+    cache_home = os.environ.get(
+        'XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache')
+    )
+    return os.path.join(cache_home, 'py3status')
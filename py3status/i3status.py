@@ -6,11 +6,9 @@ from datetime import datetime, timedelta, tzinfo
 from subprocess import Popen
 from subprocess import PIPE
 from signal import SIGTSTP, SIGSTOP, SIGUSR1, SIG_IGN, signal
-from tempfile import NamedTemporaryFile
 from threading import Thread
 from time import time, sleep
 
-from py3status.profiling import profile
 from py3status.events import IOPoller
 from py3status.constants import (
     I3S_ALLOWED_COLORS, I3S_COLOR_MODULES,
@@ -188,9 +186,11 @@ class I3status(Thread):
         self.last_output = None
         self.last_refresh_ts = time()
         self.lock = py3_wrapper.lock
+        self.mocked = False
         self.new_update = False
         self.py3_wrapper = py3_wrapper
         self.ready = False
+        self.restart_requested = False
         self.standalone = py3_wrapper.config['standalone']
         self.i3status_pipe = None
         self.time_modules = []
@@ -201,7 +201,7 @@ class I3status(Thread):
         Update time for any i3status time/tztime items.
         """
         updated = []
-        for module in self.i3modules.values():
+        for module in list(self.i3modules.values()):
             if module.is_time_module:
                 if module.update_time_value():
                     updated.append(module.module_name)
@@ -230,9 +230,14 @@ class I3status(Thread):
         Set the given i3status responses on their respective configuration.
         """
         self.update_json_list()
+        i3s_modules = self.py3_config['i3s_modules']
+        # ignore output from an i3status that is being restarted with a
+        # different config
+        if len(self.json_list) != len(i3s_modules):
+            return
         updates = []
         for index, item in enumerate(self.json_list):
-            conf_name = self.py3_config['i3s_modules'][index]
+            conf_name = i3s_modules[index]
             if conf_name not in self.i3modules:
                 self.i3modules[conf_name] = I3statusModule(conf_name,
                                                            self.py3_wrapper)
@@ -308,17 +313,32 @@ class I3status(Thread):
                 self.i3status_pipe.send_signal(SIGUSR1)
             self.last_refresh_ts = time()
 
-    @profile
+    def restart(self):
+        """
+        Restart i3status so that it uses the current config.
+        """
+        self.restart_requested = True
+        self.py3_config = self.py3_wrapper.config['py3_config']
+        self.i3modules.clear()
+        if self.i3status_pipe:
+            self.i3status_pipe.kill()
+
     def run(self):
         # if the i3status process dies we want to restart it.
         # We give up restarting if we have died too often
-        for x in range(10):
+        failures = 0
+        while failures < 10:
             if not self.lock.is_set():
                 break
             self.spawn_i3status()
             # check if we never worked properly and if so quit now
             if not self.ready:
                 break
+            # restarts due to config changes are not failures
+            if self.restart_requested:
+                self.restart_requested = False
+                continue
+            failures += 1
             # limit restart rate
             sleep(5)
 
@@ -326,6 +346,9 @@ class I3status(Thread):
         """
         Spawn i3status using a self generated config file and poll its output.
         """
+        # only imported when needed as i3status may be mocked
+        from tempfile import NamedTemporaryFile
+
         try:
             with NamedTemporaryFile(prefix='py3status_') as tmpfile:
                 self.write_tmp_i3status_config(tmpfile)
@@ -372,8 +395,9 @@ class I3status(Thread):
                                 raise IOError(msg)
                 except IOError:
                     err = sys.exc_info()[1]
-                    self.error = err
-                    self.py3_wrapper.log(err, 'error')
+                    if not self.restart_requested:
+                        self.error = err
+                        self.py3_wrapper.log(err, 'error')
         except Exception:
             self.py3_wrapper.report_exception('', notify_user=True)
         self.i3status_pipe = None
@@ -384,6 +408,7 @@ class I3status(Thread):
         """
         # mock thread is_alive() method
         self.is_alive = lambda: True
+        self.mocked = True
 
         # mock i3status output parsing
         self.last_output = []
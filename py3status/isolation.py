@@ -0,0 +1,160 @@
+"""
+Run the methods of a module in a separate process.
+
+The child process is forked from py3status once the module has been
+configured, so the module instance along with its configuration and any state
+set up in post_config_hook() is inherited.  From then on the module's state
+lives in the child and only method results are sent back.
+
+py3status is running other threads when the child is forked.  Any lock held
+by one of them at that moment stays locked in the child.  The formatter's
+locks are replaced in the child, but if the module uses another such lock the
+child will hang until the module times out and its process is restarted.
+"""
+import multiprocessing
+import os
+
+from signal import signal, SIGINT, SIGTERM, SIG_DFL, SIG_IGN
+from threading import Lock
+from traceback import format_exc
+
+from py3status.formatter import Formatter
+from py3status.py3 import ModuleErrorException
+
+# how often in seconds the child checks that py3status is still running
+PARENT_CHECK_INTERVAL = 5
+
+# how often in seconds we check that a child is still running whilst waiting
+# for a result.  Other processes may have inherited the child's end of the
+# pipe so we cannot rely on getting an EOF.
+CHILD_CHECK_INTERVAL = 1
+
+# only start one child at a time so that children do not inherit each others
+# pipes
+start_lock = Lock()
+
+
+def serve(conn, parent_conn, instance, parent_pid):
+    """
+    Run in the child process.  Call the requested methods of the module
+    instance and send back the results.
+    """
+    parent_conn.close()
+    # locks held by other threads when we were forked would stay locked
+    Formatter.reset_locks()
+    memo = getattr(getattr(instance, 'py3', None), '_format_memo', None)
+    if memo is not None:
+        memo.reset_lock()
+    # py3status handles shutting us down
+    signal(SIGINT, SIG_IGN)
+    signal(SIGTERM, SIG_DFL)
+    while True:
+        try:
+            if not conn.poll(PARENT_CHECK_INTERVAL):
+                if os.getppid() != parent_pid:
+                    break
+                continue
+            request = conn.recv()
+        except (EOFError, IOError):
+            break
+        if request is None:
+            break
+        name, args = request
+        try:
+            result = ('ok', getattr(instance, name)(*args))
+        except ModuleErrorException as e:
+            result = ('module_error', e.msg, e.timeout)
+        except Exception as e:
+            result = ('error', str(e) or e.__class__.__name__, format_exc())
+        try:
+            conn.send(result)
+        except Exception as e:
+            # the result could not be pickled
+            conn.send(('error', str(e) or e.__class__.__name__, format_exc()))
+
+
+class IsolatedModule:
+    """
+    Proxy for a module instance running in a child process.  The process is
+    started when the first method is called and restarted if it dies.
+    """
+
+    def __init__(self, module):
+        self.conn = None
+        self.lock = Lock()
+        self.module = module
+        self.process = None
+        self.terminated = False
+
+    def _start(self):
+        try:
+            context = multiprocessing.get_context('fork')
+        except AttributeError:
+            # Python 2, fork is the only option on linux
+            context = multiprocessing
+        with start_lock:
+            parent_conn, child_conn = context.Pipe()
+            self.process = context.Process(
+                target=serve,
+                args=(child_conn, parent_conn, self.module.module_class,
+                      os.getpid()),
+            )
+            self.process.daemon = True
+            self.process.start()
+            child_conn.close()
+        self.terminated = False
+        self.conn = parent_conn
+        self.module._py3_wrapper.log('module {} isolated in process {}'.format(
+            self.module.module_full_name, self.process.pid
+        ))
+
+    def call(self, name, *args):
+        """
+        Call the named method in the child process and return the result.
+        """
+        with self.lock:
+            if not (self.process and self.process.is_alive()):
+                self._start()
+            process = self.process
+            try:
+                self.conn.send((name, args))
+                while not self.conn.poll(CHILD_CHECK_INTERVAL):
+                    if not process.is_alive():
+                        raise EOFError
+                result = self.conn.recv()
+            except (EOFError, IOError):
+                self.process = None
+                if self.terminated:
+                    self.terminated = False
+                    raise ModuleErrorException('timed out', None)
+                raise Exception('isolated process exited')
+        if result[0] == 'ok':
+            return result[1]
+        if result[0] == 'module_error':
+            raise ModuleErrorException(result[1], result[2])
+        if self.module.config['debug']:
+            self.module._py3_wrapper.log(result[2])
+        raise Exception(result[1])
+
+    def terminate(self):
+        """
+        Kill the child process, it will be restarted when next needed.
+        """
+        process = self.process
+        if process:
+            self.terminated = True
+            process.terminate()
+
+    def stop(self):
+        """
+        Ask the child process to exit.
+        """
+        if self.process and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (EOFError, IOError):
+                pass
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.process = None
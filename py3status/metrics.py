@@ -0,0 +1,213 @@
+"""
+Runtime metrics of py3status modules.
+
+For each method of each module we record how often it is called, how long
+the calls take, how many fail and when it was last called.  We also record
+how often a module's output actually changes when it updates and, if it is
+memoized, how often its formatted output is reused.  The metrics
+can be written out as JSON using the ``dump_metrics`` on_click command.
+"""
+import os
+
+from bisect import bisect_left
+from json import dump
+from threading import Lock
+from time import time
+
+from py3status.formatter import Formatter
+from py3status.helpers import cache_directory
+
+try:
+    # Python 3.7+
+    from time import thread_time
+except ImportError:
+    # cpu time is not recorded
+    thread_time = None
+
+# upper bounds in seconds of the buckets used for the time histograms, the
+# last bucket holds anything longer
+HISTOGRAM_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10]
+
+
+class Histogram:
+    """
+    Histogram of times.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.max = 0
+        self.total = 0
+
+    def add(self, value):
+        self.counts[bisect_left(HISTOGRAM_BUCKETS, value)] += 1
+        self.count += 1
+        self.max = max(self.max, value)
+        self.total += value
+
+    def as_dict(self):
+        buckets = ['{:g}'.format(x) for x in HISTOGRAM_BUCKETS] + ['inf']
+        return {
+            'buckets': dict(zip(buckets, self.counts)),
+            'count': self.count,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else 0,
+            'total': self.total,
+        }
+
+
+class MethodMetrics:
+    """
+    Metrics of a module method.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.cpu_time = Histogram()
+        self.errors = 0
+        self.last_call = None
+        self.wall_time = Histogram()
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'cpu_time': self.cpu_time.as_dict() if thread_time else None,
+            'error_rate': self.errors / float(self.calls) if self.calls else 0,
+            'errors': self.errors,
+            'last_call': self.last_call,
+            'wall_time': self.wall_time.as_dict(),
+        }
+
+
+class ModuleMetrics:
+    """
+    Metrics of a module.
+    """
+
+    def __init__(self):
+        self.changes = 0
+        self.format_memo = None
+        self.methods = {}
+        self.updates = 0
+
+    def as_dict(self):
+        return {
+            'changes': self.changes,
+            'change_ratio': (
+                self.changes / float(self.updates) if self.updates else 0
+            ),
+            'format_memo': (
+                None if self.format_memo is None else self.format_memo.stats()
+            ),
+            'methods': dict(
+                (name, method.as_dict())
+                for name, method in self.methods.items()
+            ),
+            'updates': self.updates,
+        }
+
+
+class Metrics:
+    """
+    Registry of the metrics of all the modules.
+    """
+
+    def __init__(self, py3_wrapper):
+        self.lock = Lock()
+        self.modules = {}
+        self.py3_wrapper = py3_wrapper
+        self.start_time = time()
+
+    def _module(self, module_name):
+        """
+        Get the metrics of the module creating them if needed.  The lock must
+        be held.
+        """
+        module = self.modules.get(module_name)
+        if module is None:
+            module = self.modules[module_name] = ModuleMetrics()
+        return module
+
+    def record_call(self, module_name, method_name, wall_time, cpu_time,
+                    error=False):
+        """
+        Record a call of a module method.  cpu_time may be None if it is not
+        known.
+        """
+        with self.lock:
+            methods = self._module(module_name).methods
+            method = methods.get(method_name)
+            if method is None:
+                method = methods[method_name] = MethodMetrics()
+            method.calls += 1
+            method.last_call = time()
+            method.wall_time.add(wall_time)
+            if cpu_time is not None:
+                method.cpu_time.add(cpu_time)
+            if error:
+                method.errors += 1
+
+    def record_update(self, module_name, changed):
+        """
+        Record that the module updated and whether its output changed.
+        """
+        with self.lock:
+            module = self._module(module_name)
+            module.updates += 1
+            if changed:
+                module.changes += 1
+
+    def set_format_memo(self, module_name, memo):
+        """
+        Include the hits of the module's format memo in its metrics.
+        """
+        with self.lock:
+            self._module(module_name).format_memo = memo
+
+    def remove(self, module_name):
+        """
+        Forget the metrics of a module that has been stopped.
+        """
+        with self.lock:
+            self.modules.pop(module_name, None)
+
+    def get(self, module_name=None):
+        """
+        Return the metrics of the named module, or of all modules, as a dict.
+        """
+        with self.lock:
+            if module_name is not None:
+                module = self.modules.get(module_name)
+                return module.as_dict() if module else None
+            return {
+                'format_cache': Formatter.cache_stats(),
+                'modules': dict(
+                    (name, module.as_dict())
+                    for name, module in self.modules.items()
+                ),
+                'start_time': self.start_time,
+                'time': time(),
+            }
+
+    def dump(self, path=None):
+        """
+        Write the metrics as JSON.  Returns the path written to or None if
+        the metrics could not be written.
+        """
+        if path is None:
+            path = os.path.join(cache_directory(), 'metrics.json')
+        metrics = self.get()
+        try:
+            directory = os.path.dirname(path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path, 'w') as f:
+                dump(metrics, f, indent=2, sort_keys=True)
+        except (IOError, OSError) as e:
+            self.py3_wrapper.log(
+                'metrics could not be written: {}'.format(e), 'warning'
+            )
+            return None
+        self.py3_wrapper.log('metrics written to {}'.format(path))
+        return path
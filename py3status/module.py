@@ -1,56 +1,111 @@
 import os
-import imp
 import inspect
+import sys
 
-from threading import Thread, Timer
 from collections import OrderedDict
+from functools import partial
+from threading import Thread
 from time import time
 
 from py3status.composite import Composite
 from py3status.py3 import Py3, PY3_CACHE_FOREVER, ModuleErrorException
-from py3status.profiling import profile
 from py3status.formatter import Formatter
+from py3status.metrics import thread_time
 
+try:
+    # Python 3.5+
+    from inspect import iscoroutinefunction
+except ImportError:
+    def iscoroutinefunction(function):
+        return False
 
-class Module(Thread):
+try:
+    # Python 3.5+
+    from importlib.machinery import SourceFileLoader
+    from importlib.util import module_from_spec, spec_from_loader
+
+    def load_source(name, path):
+        """
+        Import the source file as the named module.  The compiled bytecode is
+        written to and reused from __pycache__.
+        """
+        loader = SourceFileLoader(name, path)
+        py_mod = module_from_spec(spec_from_loader(name, loader))
+        sys.modules[name] = py_mod
+        try:
+            loader.exec_module(py_mod)
+        except Exception:
+            # do not leave a partly initialised module behind
+            sys.modules.pop(name, None)
+            raise
+        return py_mod
+except ImportError:
+    # Python 2
+    from imp import load_source
+
+
+class Module:
     """
     This class represents a user module (imported file).
     It is responsible for executing it every given interval and
-    caching its output based on user will.
+    caching its output based on user will.  The module is run by the
+    scheduler's worker threads.
     """
 
     PARAMS_NEW = 'new'
     PARAMS_LEGACY = 'legacy'
 
+    # default longest update interval when using adaptive polling
+    ADAPTIVE_POLLING_MAX = 300
+
+    # default time in seconds that a module may take to update
+    MODULE_TIMEOUT = 60
+
+    # default time in seconds that post_config_hook() may take
+    POST_CONFIG_HOOK_TIMEOUT = 10
+
     def __init__(self, module, user_modules, py3_wrapper):
         """
         We need quite some stuff to occupy ourselves don't we ?
         """
-        Thread.__init__(self)
         self.allow_config_clicks = True
+        self.async_click = False
+        self.async_methods = set()
+        self.async_results = None
+        self.async_run = None
+        self.async_time = None
+        self.backoff = 1
         self.cache_time = None
         self.click_events = False
         self.config = py3_wrapper.config
+        self.container = False
         self.disabled = False
         self.error_messages = None
         self.error_hide = False
+        self.event_loop = None
         self.has_post_config_hook = False
         self.has_kill = False
         self.i3status_thread = py3_wrapper.i3status_thread
+        self.isolated = None
         self.last_output = []
         self.lock = py3_wrapper.lock
         self.methods = OrderedDict()
+        self.metrics = py3_wrapper.metrics
         self.module_class = None
         self.module_full_name = module
         self.module_inst = ''.join(module.split(' ')[1:])
         self.module_name = module.split(' ')[0]
         self.new_update = False
         self.nagged = False
+        self.output_changed = False
+        self.prepared = False
         self.prevent_refresh = False
+        self.scheduler = py3_wrapper.scheduler
         self.sleeping = False
+        self.suspended = False
         self.terminated = False
-        self.timer = None
         self.urgent = False
+        self.user_modules = user_modules
 
         # create a nice name for the module that matches what the module is
         # called in the user config
@@ -62,11 +117,59 @@ class Module(Thread):
         # py3wrapper this is private and any modules accessing their instance
         # should only use it on the understanding that it is not supported.
         self._py3_wrapper = py3_wrapper
+
+        # modules in a container can be suspended whilst they are hidden
+        py3_config = self.config['py3_config']
+        self.suspend_hidden = (
+            module in py3_config['.module_groups'] and
+            py3_config['py3status'].get('suspend_hidden_modules', False)
+        )
+        # modules in a container can be loaded once they are first shown
+        self.lazy = (
+            module in py3_config['.module_groups'] and
+            py3_config['py3status'].get('lazy_load_modules', False)
+        )
+
+        # adaptive polling increases the time between updates whilst the
+        # output of the module is not changing.
+        fn = py3_wrapper.get_config_attribute
+        self.adaptive_polling = fn(module, 'adaptive_polling') is True
+        self.adaptive_polling_max = fn(module, 'adaptive_polling_max')
+        if hasattr(self.adaptive_polling_max, 'none_setting'):
+            self.adaptive_polling_max = self.ADAPTIVE_POLLING_MAX
+
+        # modules that take longer than this to update are shown as an error
+        # and their worker thread is replaced.
+        self.module_timeout = fn(module, 'module_timeout')
+        if hasattr(self.module_timeout, 'none_setting'):
+            self.module_timeout = self.MODULE_TIMEOUT
+        # the first run also calls post_config_hook()
+        self.run_timeout = fn(module, 'post_config_hook_timeout')
+        if hasattr(self.run_timeout, 'none_setting'):
+            self.run_timeout = self.POST_CONFIG_HOOK_TIMEOUT
         #
         self.set_module_options(module)
 
+        if self.lazy:
+            # show the module's name until it has been loaded
+            self.last_output = [{
+                'full_text': self.module_nice_name,
+                'instance': self.module_inst,
+                'name': self.module_name,
+            }]
+        else:
+            self.load()
+
+    def __repr__(self):
+        return '<Module {}>'.format(self.module_full_name)
+
+    def load(self):
+        """
+        Load the module.  If this fails the module is disabled and the error
+        shown in its output.
+        """
         try:
-            self.load_methods(module, user_modules)
+            self.load_methods(self.module_full_name, self.user_modules)
         except Exception as e:
             # Import failed notify user in module error output
             self.disabled = True
@@ -83,9 +186,6 @@ class Module(Thread):
             )
             self._py3_wrapper.report_exception(msg, notify_user=False)
 
-    def __repr__(self):
-        return '<Module {}>'.format(self.module_full_name)
-
     @staticmethod
     def load_from_file(filepath):
         """
@@ -95,7 +195,7 @@ class Module(Thread):
         expected_class = 'Py3status'
         module_name, file_ext = os.path.splitext(os.path.split(filepath)[-1])
         if file_ext.lower() == '.py':
-            py_mod = imp.load_source(module_name, filepath)
+            py_mod = load_source(module_name, filepath)
             if hasattr(py_mod, expected_class):
                 class_inst = py_mod.Py3status()
         return class_inst
@@ -158,6 +258,23 @@ class Module(Thread):
             self.error_index = 0
         self.error_output(self.error_messages[self.error_index], method)
 
+    def run_timed_out(self):
+        """
+        Called by the scheduler when an update of the module is taking too
+        long.  The module is run again once the update has finished.
+        """
+        if self.prepared:
+            msg = 'module `{}` timed out after {}s'
+        else:
+            msg = 'module `{}` post_config_hook() timed out after {}s'
+        self._py3_wrapper.log(
+            msg.format(self.module_full_name, self.run_timeout), 'warning'
+        )
+        self.runtime_error('timed out', None)
+        # an isolated module can be killed, it will be restarted
+        if self.isolated:
+            self.isolated.terminate()
+
     def error_output(self, message, method_affected=None):
         """
         Something is wrong with the module so we want to output the error to
@@ -195,14 +312,20 @@ class Module(Thread):
         self.allow_config_clicks = False
         self.set_updated()
 
-    def start_module(self):
+    def start_module(self, delay=0):
         """
-        Start the module running.
+        Start the module running after delay seconds.  The first run prepares
+        the module.
         """
-        if not (self.disabled or self.terminated):
+        if self.lazy and not self.disabled:
+            # the module is loaded once it is shown
+            self.suspended = True
+            self._py3_wrapper.log(
+                'deferring loading of module %s' % self.module_full_name)
+        elif not (self.disabled or self.terminated):
             # Start the module and call its output method(s)
             self._py3_wrapper.log('starting module %s' % self.module_full_name)
-            self.start()
+            self.scheduler.schedule(self, time() + delay, align=False)
 
     def force_update(self):
         """
@@ -215,18 +338,37 @@ class Module(Thread):
             self.methods[meth]['cached_until'] = time()
             if self.config['debug']:
                 self._py3_wrapper.log('clearing cache for method {}'.format(meth))
-        # cancel any existing timer
-        if self.timer:
-            self.timer.cancel()
-        # get the thread to update itself
-        self.timer = Timer(0, self.run)
-        self.timer.start()
+        # get the module to update itself as soon as possible
+        self.scheduler.schedule(self)
 
     def sleep(self):
         self.sleeping = True
-        # cancel any existing timer
-        if self.timer:
-            self.timer.cancel()
+        # cancel any scheduled update
+        self.scheduler.cancel(self)
+
+    def suspend(self):
+        """
+        The module is hidden so it stops updating until it is shown again.
+        """
+        self.suspended = True
+        # the cached json output will be out of date once it is shown
+        self._py3_wrapper.output_cache.pop(self.module_full_name, None)
+        if self.config['debug']:
+            self._py3_wrapper.log(
+                'suspending module {}'.format(self.module_full_name))
+
+    def unsuspend(self):
+        """
+        The module has become visible so it should update and carry on
+        running as normal.
+        """
+        if not self.suspended:
+            return
+        self.suspended = False
+        if self.config['debug']:
+            self._py3_wrapper.log(
+                'unsuspending module {}'.format(self.module_full_name))
+        self.force_update()
 
     def disable_module(self):
         # hide message
@@ -238,8 +380,8 @@ class Module(Thread):
 
     def wake(self):
         self.sleeping = False
-        if self.disabled:
-            # module is disabled so don't wake
+        if self.disabled or self.suspended:
+            # module is disabled or suspended so don't wake
             return
         if self.cache_time is None:
             return
@@ -247,9 +389,7 @@ class Module(Thread):
         if self.cache_time == PY3_CACHE_FOREVER:
             return
         # restart
-        delay = max(self.cache_time - time(), 0)
-        self.timer = Timer(delay, self.run)
-        self.timer.start()
+        self.scheduler.schedule(self, self.cache_time)
 
     def set_updated(self):
         """
@@ -267,8 +407,11 @@ class Module(Thread):
                 # if the output is not 'valid' then don't add it.
                 if data.get('full_text') or 'separator' in data:
                     output.append(data)
+        changed = output != self.last_output
+        self.metrics.record_update(self.module_full_name, changed)
         # if changed store and force display update.
-        if output != self.last_output:
+        if changed:
+            self.output_changed = True
             # has the modules output become urgent?
             # we only care the update that this happens
             # not any after then.
@@ -459,6 +602,7 @@ class Module(Thread):
                 # ensure that we have a empty list.
                 if class_inst.Meta.container:
                     class_inst.items = []
+                    self.container = True
             except AttributeError:
                 pass
 
@@ -604,8 +748,12 @@ class Module(Thread):
                     m_type = type(getattr(class_inst, method))
                     if 'method' in str(m_type):
                         params_type = self._params_type(method, class_inst)
+                        is_async = iscoroutinefunction(
+                            getattr(class_inst, method)
+                        )
                         if method == 'on_click':
                             self.click_events = params_type
+                            self.async_click = is_async
                         elif method == 'kill':
                             self.has_kill = params_type
                         elif method == 'post_config_hook':
@@ -625,6 +773,26 @@ class Module(Thread):
                                 'name': None
                             }
                             self.methods[method] = method_obj
+                            if is_async:
+                                self.async_methods.add(method)
+
+            # coroutine methods are run on the shared event loop
+            if self.async_methods or self.async_click:
+                self.event_loop = self._py3_wrapper.get_event_loop()
+
+            # modules can be run in their own process so that they cannot
+            # hold up the rest of py3status
+            fn = self._py3_wrapper.get_config_attribute
+            if fn(module, 'isolate') is True:
+                if self.async_methods or self.async_click or self.container:
+                    self._py3_wrapper.log(
+                        'module {} cannot be isolated'.format(module),
+                        'warning'
+                    )
+                else:
+                    # only import if needed
+                    from py3status.isolation import IsolatedModule
+                    self.isolated = IsolatedModule(self)
 
         # done, log some debug info
         if self.config['debug']:
@@ -641,6 +809,11 @@ class Module(Thread):
         # by setting this to True.  Modules should do this via
         # py3.prevent_refresh()
         self.prevent_refresh = False
+        # the module cannot handle clicks until its post_config_hook() has run
+        if not self.prepared:
+            return
+        # a click means the user is interested so update at the normal rate
+        self.backoff = 1
         try:
             if self.error_messages:
                 # we have error messages
@@ -656,33 +829,156 @@ class Module(Thread):
                     self.prevent_refresh = True
 
             elif self.click_events:
-                click_method = getattr(self.module_class, 'on_click')
                 if self.click_events == self.PARAMS_NEW:
                     # new style modules
-                    click_method(event)
+                    args = (event,)
                 else:
                     # legacy modules had extra parameters passed
-                    click_method(self.i3status_thread.json_list,
-                                 self.config['py3_config']['general'], event)
+                    args = (self.i3status_thread.json_list,
+                            self.config['py3_config']['general'],
+                            event)
+                if self.isolated:
+                    # the process may be busy updating the module so we do
+                    # not wait for it.  The module is refreshed once the click
+                    # has been handled.
+                    self.prevent_refresh = True
+                    thread = Thread(target=self.isolated_click, args=args)
+                    thread.daemon = True
+                    thread.start()
+                    return
+                click_method = getattr(self.module_class, 'on_click')
+                result = click_method(*args)
+                if self.async_click:
+                    self.event_loop.run_coroutines(
+                        [result], self.async_click_done
+                    )
                 self.set_updated()
         except Exception:
             msg = 'on_click event in `{}` failed'.format(self.module_full_name)
             self._py3_wrapper.report_exception(msg)
 
-    @profile
+    def isolated_click(self, *args):
+        """
+        Run the on_click of an isolated module in its process.
+        """
+        try:
+            self.isolated.call('on_click', *args)
+        except Exception:
+            msg = 'on_click event in `{}` failed'.format(self.module_full_name)
+            self._py3_wrapper.report_exception(msg)
+            return
+        self.set_updated()
+        self.force_update()
+
+    def async_click_done(self, results):
+        """
+        Called from the event loop once a coroutine on_click has completed.
+        """
+        error = results[0]
+        if isinstance(error, Exception):
+            msg = 'on_click event in `{}` failed'.format(self.module_full_name)
+            try:
+                raise error
+            except Exception:
+                self._py3_wrapper.report_exception(msg)
+            return
+        self.set_updated()
+        if not self.prevent_refresh:
+            self.force_update()
+
+    def start_async_methods(self):
+        """
+        Start any coroutine methods that are due on the event loop.  Once
+        they have completed the module is run again to process their output.
+        Returns True if any were started.
+        """
+        now = time()
+        methods = [
+            meth for meth in self.async_methods
+            if now >= self.methods[meth]['cached_until']
+        ]
+        if not methods:
+            return False
+
+        def done(results):
+            from py3status.event_loop import CoroutineTimeout
+
+            # timeouts are shown as they are for other modules
+            for index, result in enumerate(results):
+                if isinstance(result, CoroutineTimeout):
+                    msg = 'module `{}` method `{}` {}'.format(
+                        self.module_full_name, methods[index], result
+                    )
+                    self._py3_wrapper.log(msg, 'warning')
+                    results[index] = ModuleErrorException('timed out', None)
+            self.async_time = time() - now
+            self.async_results = dict(zip(methods, results))
+            self.async_run = None
+            self.scheduler.schedule(self)
+
+        # the run is stored before it is started as the coroutines may
+        # complete, and done() clear it, before run_coroutines() returns.
+        coroutines = [self.call_method(meth) for meth in methods]
+        self.async_run = self.event_loop.run_coroutines(
+            coroutines, done, timeout=self.module_timeout, start=False
+        )
+        self.async_run.start()
+        return True
+
+    def call_method(self, meth):
+        """
+        Call the named output method of the module and return its response.
+        """
+        method = getattr(self.module_class, meth)
+        if self.isolated:
+            method = partial(self.isolated.call, meth)
+        if self.methods[meth]['call_type'] == self.PARAMS_NEW:
+            # new style modules
+            return method()
+        # legacy modules had parameters passed
+        return method(self.i3status_thread.json_list,
+                      self.config['py3_config']['general'])
+
     def run(self):
+        """
+        Called by the scheduler, the run is profiled if the user has turned
+        profiling on.
+        """
+        self._py3_wrapper.profiler.run(self.module_full_name, self.run_module)
+
+    def run_module(self):
         """
         On a timely fashion, execute every method found for this module.
         We will respect and set a cache timeout for each method if the user
         didn't already do so.
         We will execute the 'kill' method of the module when we terminate.
         """
-        # cancel any existing timer
-        if self.timer:
-            self.timer.cancel()
-
-        if self.lock.is_set():
+        if self.lock.is_set() and not self.terminated:
+            # a lazily loaded module is loaded when it is first run
+            if self.lazy:
+                self.lazy = False
+                self.suspended = False
+                self.load()
+                if self.disabled:
+                    return
+            # the module is prepared by its first run so that modules with a
+            # slow post_config_hook() do not hold up the others.
+            if not self.prepared:
+                self.prepare_module()
+                self.prepared = True
+                self.run_timeout = self.module_timeout
+                if self.terminated:
+                    return
+            # coroutine methods are run on the event loop first, the module
+            # is run again with their results once they have all finished.
+            if self.async_methods and self.async_results is None:
+                if self.async_run or self.start_async_methods():
+                    return
+            async_results = self.async_results or {}
+            async_time = self.async_time
+            self.async_results = None
             cache_time = None
+            self.output_changed = False
             # execute each method of this module
             for meth, obj in self.methods.items():
                 my_method = self.methods[meth]
@@ -691,23 +987,29 @@ class Module(Thread):
                 if not self.lock.is_set():
                     break
 
-                # respect the cache set for this method
-                if time() < obj['cached_until']:
+                # respect the cache set for this method, coroutine methods
+                # that became due after the others were started wait for the
+                # next run.
+                waiting = (meth in self.async_methods and
+                           meth not in async_results)
+                if waiting or time() < obj['cached_until']:
                     if not cache_time or obj['cached_until'] < cache_time:
                         cache_time = obj['cached_until']
                     continue
 
+                # the call is timed for the metrics
+                error = False
+                start = time()
+                if thread_time:
+                    cpu_start = thread_time()
                 try:
                     # execute method and get its output
-                    method = getattr(self.module_class, meth)
-                    if my_method['call_type'] == self.PARAMS_NEW:
-                        # new style modules
-                        response = method()
+                    if meth in async_results:
+                        response = async_results[meth]
+                        if isinstance(response, Exception):
+                            raise response
                     else:
-                        # legacy modules had parameters passed
-                        response = method(
-                            self.i3status_thread.json_list,
-                            self.config['py3_config']['general'])
+                        response = self.call_method(meth)
 
                     if isinstance(response, dict):
                         # this is a shiny new module giving a dict response
@@ -775,6 +1077,7 @@ class Module(Thread):
                     self.allow_config_clicks = True
                 except ModuleErrorException as e:
                     # module has indicated that it has an error
+                    error = True
                     self.runtime_error(e.msg, meth)
                     if e.timeout:
                         if e.timeout is PY3_CACHE_FOREVER:
@@ -787,6 +1090,7 @@ class Module(Thread):
                                                       self.config['cache_timeout'])
 
                 except Exception as e:
+                    error = True
                     msg = 'Instance `{}`, user method `{}` failed'
                     msg = msg.format(self.module_full_name, meth)
                     self._py3_wrapper.report_exception(msg, notify_user=False)
@@ -796,28 +1100,70 @@ class Module(Thread):
                                                   'cache_timeout',
                                                   self.config['cache_timeout'])
 
+                if meth in async_results:
+                    # coroutines run on the event loop so only the time until
+                    # they all completed is known
+                    wall_time = async_time
+                    cpu_time = None
+                else:
+                    wall_time = time() - start
+                    cpu_time = thread_time() - cpu_start if thread_time else None
+                self.metrics.record_call(
+                    self.module_full_name, meth, wall_time, cpu_time, error
+                )
+
             if cache_time is None:
                 cache_time = time() + self.config['cache_timeout']
             self.cache_time = cache_time
             # new style modules can signal they want to cache forever
             if cache_time == PY3_CACHE_FOREVER:
                 return
+            if self.adaptive_polling:
+                cache_time = self.adaptive_cache_time(cache_time)
+            # modules hidden inside a container are suspended until shown
+            if (self.suspend_hidden and not
+                    self._py3_wrapper.is_module_visible(self.module_full_name)):
+                self.suspend()
+                return
             # don't be hasty mate
-            # set timer to do update next time one is needed
-            if not self.sleeping:
-                delay = max(cache_time - time(),
-                            self.config['minimum_interval'])
-                self.timer = Timer(delay, self.run)
-                self.timer.start()
+            # schedule the update for the next time one is needed
+            if not (self.sleeping or self.terminated):
+                due = max(cache_time,
+                          time() + self.config['minimum_interval'])
+                self.scheduler.schedule(self, due)
+
+    def adaptive_cache_time(self, cache_time):
+        """
+        Stretch the time till the next update if the output has not changed.
+        Each unchanged update doubles the interval until adaptive_polling_max
+        is reached.  Any change returns us to the normal interval.
+        """
+        if self.output_changed:
+            self.backoff = 1
+            return cache_time
+        now = time()
+        # the update may already be due, eg cache_timeout = 0, but we never
+        # update faster than minimum_interval so this stops us doubling the
+        # backoff without limit
+        interval = max(cache_time - now, self.config['minimum_interval'])
+        limit = max(interval, self.adaptive_polling_max)
+        if interval * self.backoff < limit:
+            self.backoff *= 2
+        return now + min(interval * self.backoff, limit)
 
     def kill(self):
-        # stop timer if exists
-        if self.timer:
-            self.timer.cancel()
+        # prevent any further updates and cancel any scheduled update
+        self.terminated = True
+        self.scheduler.cancel(self)
+        # cancel any running coroutines
+        if self.async_run:
+            self.async_run.cancel()
         # check and execute the 'kill' method if present
         if self.has_kill:
             try:
                 kill_method = getattr(self.module_class, 'kill')
+                if self.isolated:
+                    kill_method = partial(self.isolated.call, 'kill')
                 if self.has_kill == self.PARAMS_NEW:
                     kill_method()
                 else:
@@ -827,3 +1173,5 @@ class Module(Thread):
             except Exception:
                 # this would be stupid to die on exit
                 pass
+        if self.isolated:
+            self.isolated.stop()
@@ -85,10 +85,22 @@ class Py3status:
         self.urgent = False
         if '{button}' not in self.format:
             self.open = True
+        self.py3.register_function('content_function', self._content_function)
         self.py3.register_function('urgent_function', self._urgent_function)
 
+    def _content_function(self):
+        '''
+        This returns a set of the modules shown, none if the frame is closed.
+        '''
+        if self.open:
+            return set(self.items)
+        return set()
+
     def _urgent_function(self, module_list):
         self.urgent = True
+        # a closed frame is not updated by its content so show the urgency
+        if not self.open:
+            self.py3.update()
 
     def frame(self):
 
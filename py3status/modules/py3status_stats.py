@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Display the resources used by py3status itself.
+
+Configuration parameters:
+    cache_timeout: refresh interval for this module (default 10)
+    format: display format for this module
+        (default '[\?color=cpu py3status {cpu_percent:.1f}%] {memory:.1f}MiB')
+    thresholds: specify color thresholds to use
+        (default [(0, 'good'), (5, 'degraded'), (20, 'bad')])
+
+Format placeholders:
+    {cpu_percent} cpu used by py3status since the last update as a percentage
+    {memory} memory used by py3status in MiB
+    {slowest_module} module whose methods take the longest on average
+    {slowest_time} average time in milliseconds of the slowest module's methods
+    {threads} number of threads running
+    {update_rate} module method calls per minute since the last update
+
+Color thresholds:
+    cpu: change color based on the value of cpu_percent
+    slowest: change color based on the value of slowest_time
+
+Examples:
+```
+# show the slowest module
+py3status_stats {
+    format = '{cpu_percent:.1f}% [\?color=slowest {slowest_module} {slowest_time:.0f}ms]'
+    thresholds = {
+        'cpu': [(0, 'good'), (5, 'degraded'), (20, 'bad')],
+        'slowest': [(0, 'good'), (100, 'degraded'), (1000, 'bad')],
+    }
+}
+```
+"""
+
+from __future__ import division
+
+import os
+
+from threading import active_count
+from time import time
+
+STATM = '/proc/self/statm'
+
+
+class Py3status:
+    """
+    """
+    # available configuration parameters
+    cache_timeout = 10
+    format = '[\?color=cpu py3status {cpu_percent:.1f}%] {memory:.1f}MiB'
+    thresholds = [(0, 'good'), (5, 'degraded'), (20, 'bad')]
+
+    def post_config_hook(self):
+        self.calls = None
+        self.cpu = sum(os.times()[:2])
+        self.page_size = os.sysconf('SC_PAGE_SIZE')
+        self.time = time()
+
+    def _get_memory(self):
+        """
+        Resident memory of py3status in MiB.
+        """
+        try:
+            with open(STATM) as f:
+                pages = int(f.read().split()[1])
+        except (IOError, OSError, IndexError, ValueError):
+            return None
+        return pages * self.page_size / 1024 ** 2
+
+    def _get_calls(self, metrics):
+        """
+        Total method calls and the slowest module and its average time.
+        """
+        calls = 0
+        slowest_module = None
+        slowest_time = 0
+        for name, module in metrics.get('modules', {}).items():
+            count = total = 0
+            for method in module['methods'].values():
+                calls += method['calls']
+                count += method['wall_time']['count']
+                total += method['wall_time']['total']
+            if count and total / count > slowest_time:
+                slowest_module = name
+                slowest_time = total / count
+        return calls, slowest_module, slowest_time * 1000
+
+    def py3status_stats(self):
+        now = time()
+        cpu = sum(os.times()[:2])
+        metrics = self.py3.get_metrics()
+        calls, slowest_module, slowest_time = self._get_calls(metrics)
+
+        # rates are measured between our updates so the first update, which
+        # is made just after we are loaded, has none.  This also means that
+        # starting up py3status is not included.
+        cpu_percent = update_rate = None
+        if self.calls is not None and now > self.time:
+            cpu_percent = (cpu - self.cpu) / (now - self.time) * 100
+            update_rate = (calls - self.calls) / (now - self.time) * 60
+        self.calls = calls
+        self.cpu = cpu
+        self.time = now
+
+        self.py3.threshold_get_color(cpu_percent or 0, 'cpu')
+        self.py3.threshold_get_color(slowest_time, 'slowest')
+
+        return {
+            'cached_until': self.py3.time_in(self.cache_timeout),
+            'full_text': self.py3.safe_format(
+                self.format,
+                {
+                    'cpu_percent': cpu_percent,
+                    'memory': self._get_memory(),
+                    'slowest_module': slowest_module,
+                    'slowest_time': slowest_time,
+                    'threads': active_count(),
+                    'update_rate': update_rate,
+                },
+            ),
+        }
+
+
+if __name__ == "__main__":
+    """
+    Run module in test mode.
+    """
+    from py3status.module_test import module_test
+    module_test(Py3status)
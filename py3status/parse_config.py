@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
-import codecs
-import imp
 import os
+import pickle
 import re
+import sys
 
 from collections import OrderedDict
+from hashlib import sha1
+from importlib import import_module
 from string import Template
-from subprocess import check_output
+from codecs import BOM_UTF8, BOM_UTF16_BE, BOM_UTF16_LE, BOM_UTF32_BE, BOM_UTF32_LE
 
 from py3status.constants import (
     I3S_SINGLE_NAMES,
@@ -19,7 +21,9 @@ from py3status.constants import (
     TZTIME_FORMAT,
 )
 
-from py3status.private import PrivateHide, PrivateBase64
+from py3status.helpers import cache_directory
+from py3status.private import Private, PrivateHide, PrivateBase64
+from py3status.version import version
 
 
 class ParseException(Exception):
@@ -137,17 +141,8 @@ class ConfigParser:
         name = name.split()[0]
         if name in self.container_modules:
             return
-        root = os.path.dirname(os.path.realpath(__file__))
-        module_path = os.path.join(root, 'modules')
         try:
-            info = imp.find_module(name, [module_path])
-        except ImportError:
-            return
-        if not info:
-            return
-        (file, pathname, description) = info
-        try:
-            py_mod = imp.load_module(name, file, pathname, description)
+            py_mod = import_module('py3status.modules.{}'.format(name))
         except:
             # We cannot load the module!  We could error out here but then the
             # user gets informed that the problem is with their config.  This
@@ -503,24 +498,141 @@ class ConfigParser:
                 name = []
 
 
+def config_cache_path(config_path):
+    """
+    Path of the file used to cache the processed config.
+    """
+    name = sha1(config_path.encode('utf-8')).hexdigest()
+    return os.path.join(cache_directory(), 'config_{}.pickle'.format(name))
+
+
+# byte order marks, utf-32 must be checked before utf-16
+BOMS = [
+    (BOM_UTF8, 'utf-8-sig'),
+    (BOM_UTF32_LE, 'utf-32'),
+    (BOM_UTF32_BE, 'utf-32'),
+    (BOM_UTF16_LE, 'utf-16'),
+    (BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def decode_config(data):
+    """
+    Decode the contents of the config file.  We use any byte order mark
+    otherwise utf-8 is tried, falling back to latin-1 which cannot fail.
+    """
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return data.decode(encoding)
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('latin-1')
+
+
+def config_cache_key(config_path, data):
+    """
+    The key for the cached config.  Changes to the config file or to
+    py3status mean the cache is not used.
+    """
+    stat = os.stat(config_path)
+    return (config_path, stat.st_mtime, stat.st_size, sha1(data).hexdigest(),
+            version, sys.version_info[:2])
+
+
+def has_private(value):
+    """
+    Check if a config value contains any private (obfuscated) values.
+    """
+    if isinstance(value, Private):
+        return True
+    if isinstance(value, dict):
+        return any(has_private(x) for x in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_private(x) for x in value)
+    return False
+
+
+def load_cached_config(config_path, key):
+    """
+    Get the processed config from the cache.  Returns None if it is not
+    cached or the cache is out of date.
+    """
+    try:
+        with open(config_cache_path(config_path), 'rb') as f:
+            cached = pickle.load(f)
+    except Exception:
+        return None
+    if cached.get('key') != key:
+        return None
+    return cached['config']
+
+
+def save_cached_config(config_path, key, config):
+    """
+    Store the processed config in the cache.  Configs with private values are
+    not cached so that these are not written to disk.
+    """
+    if has_private(config):
+        return
+    cache_path = config_cache_path(config_path)
+    tmp_path = '{}.{}'.format(cache_path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'key': key, 'config': config}, f,
+                        pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, cache_path)
+    except Exception:
+        # caching is only an optimisation
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
 def process_config(config_path, py3_wrapper=None):
     """
     Parse i3status.conf so we can adapt our code to the i3status config.
+    The processed config is cached so that it does not need parsing again
+    until the config file changes.
     """
+    config_path = os.path.realpath(config_path)
+    with open(config_path, 'rb') as f:
+        data = f.read()
+    key = config_cache_key(config_path, data)
+    config = load_cached_config(config_path, key)
+    if config is not None:
+        if py3_wrapper:
+            py3_wrapper.log('using cached config')
+        return config
+
+    # configs with errors are not cached so that the user is told of them
+    errors = []
 
     def notify_user(error):
+        errors.append(error)
         if py3_wrapper:
             py3_wrapper.notify_user(error)
         else:
             print(error)
 
+    config = _process_config(decode_config(data), notify_user)
+    if not errors:
+        save_cached_config(config_path, key, config)
+    return config
+
+
+def _process_config(config_text, notify_user):
+    """
+    Parse and process the config.  Errors are passed to notify_user.
+    """
+
     def parse_config(config):
         '''
-        Parse text or file as a py3status config file.
+        Parse text as a py3status config file.
         '''
-
-        if hasattr(config, 'readlines'):
-            config = ''.join(config.readlines())
         parser = ConfigParser(config)
         parser.parse()
         parsed = parser.config
@@ -529,19 +641,15 @@ def process_config(config_path, py3_wrapper=None):
 
     config = {}
 
-    # get the file encoding this is important with multi-byte unicode chars
-    encoding = check_output(['file', '-b', '--mime-encoding', '--dereference', config_path])
-    encoding = encoding.strip().decode('utf-8')
-    with codecs.open(config_path, 'r', encoding) as f:
-        try:
-            config_info = parse_config(f)
-        except ParseException as e:
-            # There was a problem use our special error config
-            error = e.one_line()
-            notify_user(error)
-            error_config = Template(ERROR_CONFIG).substitute(
-                error=error.replace('"', '\\"'))
-            config_info = parse_config(error_config)
+    try:
+        config_info = parse_config(config_text)
+    except ParseException as e:
+        # There was a problem use our special error config
+        error = e.one_line()
+        notify_user(error)
+        error_config = Template(ERROR_CONFIG).substitute(
+            error=error.replace('"', '\\"'))
+        config_info = parse_config(error_config)
 
     # update general section with defaults
     general_defaults = GENERAL_DEFAULTS.copy()
@@ -681,7 +789,6 @@ def process_config(config_path, py3_wrapper=None):
 if __name__ == '__main__':
     # process a config file and display output
     # file name user supplied or ~/.i3/i3status.conf
-    import sys
     import pprint
     if len(sys.argv) > 1:
         file_name = sys.argv[1]
@@ -1,21 +1,160 @@
+"""
+Profiling of py3status.
+
+Modules can be profiled whilst py3status is running.  Profiling is turned on
+and off by sending py3status a SIGUSR2 signal or with the ``profile`` on_click
+command.  Whilst it is on each run of a module is profiled and the results
+are combined for each module.  When it is turned off a summary of the most
+expensive functions of each module is logged and the combined results are
+written to a pstats file.
+
+Runs of different modules are profiled separately.  Since Python 3.12 only
+one profiler can be active at a time and it sees the calls made by all
+threads, so a run that starts whilst another is being profiled is not
+profiled and the profile of a module may include calls made by other modules
+that were running at the same time.
+"""
 import cProfile
+import os
+import pstats
+
+from threading import Lock
+from time import strftime
+
+from py3status.helpers import cache_directory
+
+try:
+    # Python 2, pstats writes byte strings
+    from StringIO import StringIO
+except ImportError:
+    # Python 3
+    from io import StringIO
+
+# number of functions shown for each module in the logged summary
+SUMMARY_LINES = 10
 
-# Used in development
-enable_profiling = False
 
+class Profiler:
+    """
+    Profile runs of modules and combine the results for each module.
+    """
 
-def profile(thread_run_fn):
-    if not enable_profiling:
-        return thread_run_fn
+    def __init__(self, py3_wrapper, directory=None):
+        self.directory = directory
+        self.enabled = False
+        self.lock = Lock()
+        self.py3_wrapper = py3_wrapper
+        self.runs = {}
+        self.skipped = 0
+        self.stats = {}
+
+    def toggle(self):
+        """
+        Turn profiling on or off.
+        """
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self):
+        """
+        Start profiling modules.
+        """
+        with self.lock:
+            self.enabled = True
+            self.runs = {}
+            self.skipped = 0
+            self.stats = {}
+        self.py3_wrapper.log('profiling started')
 
-    def wrapper_run(self):
-        """Wrap the Thread.run() method
+    def run(self, name, function, *args):
+        """
+        Call the function, if profiling is on then it is profiled and the
+        results added to those of the named module.
         """
+        if not self.enabled:
+            return function(*args)
         profiler = cProfile.Profile()
         try:
-            return profiler.runcall(thread_run_fn, self)
+            profiler.enable()
+        except ValueError:
+            # newer pythons only allow one profiler to be active at a time, we
+            # do not wait for it as that would hold up this module.
+            with self.lock:
+                self.skipped += 1
+            return function(*args)
+        try:
+            return function(*args)
         finally:
-            thread_id = getattr(self, 'ident', 'core')
-            profiler.dump_stats("py3status-%s.profile" % thread_id)
+            profiler.disable()
+            self.add(name, profiler)
+
+    def add(self, name, profiler):
+        """
+        Add the results of a profiled run to those of the named module.
+        """
+        with self.lock:
+            if not self.enabled:
+                return
+            self.runs[name] = self.runs.get(name, 0) + 1
+            if name in self.stats:
+                self.stats[name].add(profiler)
+            else:
+                self.stats[name] = pstats.Stats(profiler)
 
-    return wrapper_run
+    def stop(self):
+        """
+        Stop profiling.  A summary of the results is logged and the combined
+        results are written to a file.  Returns the path of the file or None
+        if nothing was profiled.
+        """
+        with self.lock:
+            self.enabled = False
+            runs = self.runs
+            skipped = self.skipped
+            stats = self.stats
+            self.runs = {}
+            self.stats = {}
+        if skipped:
+            self.py3_wrapper.log(
+                '{} module runs were not profiled as another run was being '
+                'profiled'.format(skipped),
+                'warning'
+            )
+        if not stats:
+            self.py3_wrapper.log('profiling stopped, no modules were run')
+            return None
+
+        # modules that used the most time first
+        names = sorted(stats, key=lambda name: -stats[name].total_tt)
+        for name in names:
+            stream = StringIO()
+            module_stats = stats[name]
+            module_stats.stream = stream
+            module_stats.sort_stats('cumulative').print_stats(SUMMARY_LINES)
+            msg = 'profile of module {}: {} runs, {:.3f}s\n{}'
+            self.py3_wrapper.log(msg.format(
+                name, runs[name], module_stats.total_tt, stream.getvalue()
+            ))
+        # combine the results of all the modules
+        combined = stats[names[0]]
+        combined.add(*[stats[name] for name in names[1:]])
+
+        directory = self.directory or cache_directory()
+        path = os.path.join(
+            directory, 'py3status-{}.pstats'.format(strftime('%Y%m%d-%H%M%S'))
+        )
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            combined.dump_stats(path)
+        except (IOError, OSError) as e:
+            self.py3_wrapper.log(
+                'profile could not be written: {}'.format(e), 'warning'
+            )
+            return None
+        self.py3_wrapper.log('profiling stopped, profile written to {}'.format(
+            path
+        ))
+        return path
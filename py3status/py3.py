@@ -5,20 +5,24 @@ import sys
 import shlex
 
 from fnmatch import fnmatch
+from functools import partial
 from math import log10
-from pprint import pformat
 from subprocess import Popen, PIPE
 from time import time
 
 from py3status import exceptions
-from py3status.formatter import Formatter, Composite
-from py3status.request import HttpResponse
+from py3status.formatter import (
+    Composite, Formatter, FormatCache, FORMAT_MEMO_SIZE
+)
 
 PY3_CACHE_FOREVER = -1
 PY3_LOG_ERROR = 'error'
 PY3_LOG_INFO = 'info'
 PY3_LOG_WARNING = 'warning'
 
+# characters that make a name an fnmatch pattern
+FNMATCH_SPECIAL = frozenset('*?[')
+
 # basestring does not exist in python3
 try:
     basestring
@@ -95,11 +99,13 @@ class Py3:
     def __init__(self, module=None, i3s_config=None, py3status=None):
         self._audio = None
         self._config_setting = {}
+        self._format_memo = None
         self._format_placeholders = {}
         self._format_placeholders_cache = {}
         self._i3s_config = i3s_config or {}
         self._module = module
         self._is_python_2 = sys.version_info < (3, 0)
+        self._placeholders_used = None
         self._report_exception_cache = set()
         self._thresholds = None
 
@@ -114,6 +120,15 @@ class Py3:
                 i3s_config = self._module.config['py3_config']['general']
                 self._i3s_config = i3s_config
             self._py3status_module = module.module_class
+            if self._get_config_setting('memoize_format'):
+                self._format_memo = FormatCache(FORMAT_MEMO_SIZE)
+                module.metrics.set_format_memo(
+                    module.module_full_name, self._format_memo
+                )
+            # the module's config has been applied so we can find the
+            # placeholders its formats use now.  If testing the config is
+            # set after we are created so this is done when first needed.
+            self._placeholders_init()
 
     def __getattr__(self, name):
         """
@@ -182,6 +197,22 @@ class Py3:
                     self._thresholds[key] = [(x[0], self._get_color(x[1]))
                                              for x in value]
 
+    def _placeholders_init(self):
+        """
+        Find the placeholders used by each of the module's format parameters.
+        """
+        used = set()
+        for name in dir(self._py3status_module):
+            if not name.startswith('format'):
+                continue
+            format_string = getattr(self._py3status_module, name, None)
+            if not isinstance(format_string, basestring):
+                continue
+            placeholders = self._formatter.get_placeholders(format_string)
+            self._format_placeholders[format_string] = placeholders
+            used.update(placeholders)
+        self._placeholders_used = frozenset(used)
+
     def _get_module_info(self, module_name):
         """
         THIS IS PRIVATE AND UNSUPPORTED.
@@ -379,6 +410,7 @@ class Py3:
 
         if self._module:
             # nicely format logs if we can using pretty print
+            from pprint import pformat
             message = pformat(message)
             # start on new line if multi-line output
             if '\n' in message:
@@ -409,6 +441,18 @@ class Py3:
             output = module_info['module'].get_latest()
         return output
 
+    def get_metrics(self, module_name=None):
+        """
+        Return the runtime metrics that py3status has recorded for its
+        modules as a dict, these are the metrics written by the
+        ``dump_metrics`` on_click command.  If module_name is supplied then
+        only the metrics of the named module are returned, or None if it has
+        none.
+        """
+        if not self._module:
+            return None if module_name else {}
+        return self._module._py3_wrapper.metrics.get(module_name)
+
     def trigger_event(self, module_name, event):
         """
         Trigger an event on a named module.
@@ -550,7 +594,7 @@ class Py3:
 
         # We cache things to prevent parsing the format_string more than needed
         try:
-            return self._format_placeholders_cache[format_string][name]
+            return self._format_placeholders_cache[format_string, name]
         except KeyError:
             pass
 
@@ -560,14 +604,15 @@ class Py3:
         else:
             placeholders = self._format_placeholders[format_string]
 
-        result = False
-        for placeholder in placeholders:
-            if fnmatch(placeholder, name):
-                result = True
-                break
-        if format_string not in self._format_placeholders_cache:
-            self._format_placeholders_cache[format_string] = {}
-        self._format_placeholders_cache[format_string][name] = result
+        if not FNMATCH_SPECIAL.intersection(name):
+            result = name in placeholders
+        else:
+            result = False
+            for placeholder in placeholders:
+                if fnmatch(placeholder, name):
+                    result = True
+                    break
+        self._format_placeholders_cache[format_string, name] = result
         return result
 
     def get_placeholders_list(self, format_string, match=None):
@@ -603,6 +648,20 @@ class Py3:
                 found.append(placeholder)
         return found
 
+    def placeholders_used(self):
+        """
+        Returns a frozenset of the placeholders used by the module's format
+        parameters, ie ``format`` and any parameter whose name starts with
+        ``format_``.
+
+        This is useful to avoid getting data that will not be shown.  The
+        format parameters are checked when the module is loaded so changes
+        made to them by the module itself are not included.
+        """
+        if self._placeholders_used is None:
+            self._placeholders_init()
+        return self._placeholders_used
+
     def safe_format(self, format_string, param_dict=None,
                     force_composite=False, attr_getter=None):
         """
@@ -653,6 +712,9 @@ class Py3:
 
         attr_getter is a function that will when called with an attribute name
         as a parameter will return a value.
+
+        If ``memoize_format`` is set in the config then the output is reused
+        while the placeholders that it uses are unchanged.
         """
         try:
             return self._formatter.format(
@@ -661,6 +723,7 @@ class Py3:
                 param_dict,
                 force_composite=force_composite,
                 attr_getter=attr_getter,
+                memo=self._format_memo,
             )
         except Exception:
             self._report_exception(
@@ -793,7 +856,43 @@ class Py3:
         if self._is_python_2:
             output = output.decode('utf-8')
             error = error.decode('utf-8')
-        retcode = process.poll()
+        return self._check_command_output(
+            command, output, error, process.poll()
+        )
+
+    def command_output_async(self, command, shell=False):
+        """
+        Awaitable version of command_output() for use in coroutine (async
+        def) module methods.  The event loop is not blocked whilst the
+        command runs.
+
+        Requires python 3.5+
+        """
+        if shell:
+            if not isinstance(command, basestring):
+                command = ' '.join(command)
+        elif isinstance(command, basestring):
+            command = shlex.split(command)
+        check = partial(self._check_command_output, command)
+        return self._get_event_loop().command_output(command, shell, check)
+
+    def _get_event_loop(self):
+        """
+        Get the event loop used by the module's coroutine methods.
+        """
+        event_loop = self._module.event_loop
+        if not event_loop or not event_loop.available:
+            raise Exception(
+                'awaitable helpers can only be used in coroutine methods'
+            )
+        return event_loop
+
+    def _check_command_output(self, command, output, error, retcode):
+        """
+        Check the result of running a command, raising an Exception on error.
+        """
+        if isinstance(command, basestring):
+            command = [command]
         if retcode:
             # under certain conditions a successfully run command may get a
             # return code of -15 even though correct output was returned see
@@ -897,9 +996,31 @@ class Py3:
         if headers is None:
             headers = {}
 
+        # only imported when needed as urllib is slow to import
+        from py3status.request import HttpResponse
+
         return HttpResponse(url,
                             params=params,
                             data=data,
                             headers=headers,
                             timeout=timeout,
                             auth=auth)
+
+    def request_async(self, url, params=None, data=None, headers=None,
+                      timeout=None, auth=None):
+        """
+        Awaitable version of request() for use in coroutine (async def)
+        module methods.  The request is made in a separate thread so that the
+        event loop is not blocked.
+
+        Requires python 3.5+
+        """
+        def request():
+            response = self.request(url, params=params, data=data,
+                                    headers=headers, timeout=timeout,
+                                    auth=auth)
+            # read the body now so that the event loop is not blocked later
+            response.text
+            return response
+
+        return self._get_event_loop().run_in_executor(request)
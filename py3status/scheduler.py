@@ -0,0 +1,341 @@
+import heapq
+
+from itertools import count
+from threading import Condition, Thread
+from time import time
+
+try:
+    # Python 3
+    from queue import Queue
+except ImportError:
+    # Python 2
+    from Queue import Queue
+
+# default number of worker threads used to run modules
+WORKERS = 8
+
+# default time in seconds that an item may be delayed so that it can be run
+# together with other items
+WAKEUP_SLACK = 0.5
+
+# how often in seconds to log wakeup statistics when debugging
+STATS_INTERVAL = 60
+
+
+class Worker(Thread):
+    """
+    A worker thread.  Items that are due are taken from the scheduler's queue
+    and their run() method is called.
+
+    If an item takes too long to run the worker is abandoned, it will exit
+    once the item finally returns.
+    """
+
+    def __init__(self, scheduler):
+        Thread.__init__(self)
+        self.abandoned = False
+        self.daemon = True
+        self.scheduler = scheduler
+
+    def run(self):
+        queue = self.scheduler.queue
+        while True:
+            item = queue.get()
+            # None is used to tell the worker to exit
+            if item is None:
+                self.scheduler.worker_exited(self)
+                break
+            self.scheduler.item_started(item, self)
+            try:
+                item.run()
+            except Exception:
+                msg = 'Scheduled run of `{}` failed'.format(item)
+                self.scheduler.py3_wrapper.report_exception(
+                    msg, notify_user=False
+                )
+            finally:
+                self.scheduler.item_finished(item, self)
+            if self.abandoned:
+                break
+
+
+class Scheduler(Thread):
+    """
+    This class keeps the time that each item (generally a py3status module) is
+    next due to be run.  Items that are due are passed to a fixed set of
+    worker threads, this saves us from creating a new thread every time a
+    module needs to update.
+
+    Items must be hashable and provide a run() method.  An item is only ever
+    run by one worker at a time, if it becomes due whilst running then it will
+    be run again once it has finished.
+
+    Items may have a run_timeout attribute.  If a run takes longer than this
+    the item's run_timed_out() method is called and its worker is replaced so
+    that other items are not held up.  The number of replacement workers is
+    limited so a hung service cannot create unlimited threads.
+
+    To reduce the number of times that we wake, due times are aligned to
+    multiples of slack seconds so that items due at similar times are run
+    together.  Items due within slack seconds are not delayed.
+    """
+
+    def __init__(self, py3_wrapper, workers=WORKERS, slack=WAKEUP_SLACK):
+        Thread.__init__(self)
+        self.daemon = True
+        self.active = {}
+        self.condition = Condition()
+        self.counter = count()
+        self.entries = {}
+        self.heap = []
+        self.max_workers = workers * 2
+        self.pending = set()
+        # the number of workers that should be available to run items
+        self.worker_count = workers
+        # workers that have been asked to exit but have not yet done so
+        self.exiting = 0
+        self.py3_wrapper = py3_wrapper
+        self.queue = Queue()
+        self.running = False
+        self.slack = slack
+        self.workers = [Worker(self) for x in range(workers)]
+
+        # statistics
+        self.queue_depth_max = 0
+        self.stats_start = time()
+        self.timeouts = 0
+        self.wakeups = 0
+        self.wakeups_unaligned = 0
+
+    def start(self):
+        """
+        Start the scheduler and its workers.
+        """
+        self.running = True
+        for worker in self.workers:
+            worker.start()
+        Thread.start(self)
+
+    def stop(self):
+        """
+        Stop the scheduler, no more items will be run.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+            for worker in self.workers:
+                self.queue.put(None)
+
+    def configure(self, workers=WORKERS, slack=WAKEUP_SLACK):
+        """
+        Change the number of workers and the slack period.  Workers that are
+        no longer needed exit once they have finished their current item.
+        """
+        with self.condition:
+            self.slack = slack
+            self.max_workers = workers * 2
+            self.worker_count = workers
+            if not self.running:
+                return
+            current = self._start_workers()
+            for x in range(current - workers):
+                self.exiting += 1
+                self.queue.put(None)
+
+    def worker_exited(self, worker):
+        """
+        Called by a worker when it has been told to exit.
+        """
+        with self.condition:
+            if self.running:
+                self.exiting -= 1
+                self.workers.remove(worker)
+
+    def schedule(self, item, due=None, align=True):
+        """
+        Schedule item to be run at time due, if due is None then the item will
+        be run as soon as possible.  Any existing scheduling of the item is
+        replaced.  If align is False the due time is not aligned to the slack
+        period.
+        """
+        now = time()
+        if due is None:
+            due = now
+        requested = due
+        # align to the slack period
+        if align and self.slack and due - now > self.slack:
+            due += -due % self.slack
+        with self.condition:
+            self._remove(item)
+            entry = [due, next(self.counter), item, requested]
+            self.entries[item] = entry
+            heapq.heappush(self.heap, entry)
+            # we only need to wake the scheduler if it will now need to run
+            # something sooner than it had planned.
+            if self.heap[0] is entry:
+                self.condition.notify()
+
+    def cancel(self, item):
+        """
+        Cancel any scheduled run of item.
+        """
+        with self.condition:
+            self._remove(item)
+            self.pending.discard(item)
+
+    def queue_depth(self):
+        """
+        Number of items waiting for a worker.
+        """
+        return self.queue.qsize()
+
+    def item_started(self, item, worker):
+        """
+        Called by a worker when it starts running an item.
+        """
+        with self.condition:
+            self.active[item] = (time(), worker)
+            # wake the scheduler so it can watch for the run timing out
+            if getattr(item, 'run_timeout', None):
+                self.condition.notify()
+
+    def item_finished(self, item, worker):
+        """
+        Called by a worker when it has finished running an item.
+        """
+        with self.condition:
+            del self.active[item]
+            if worker.abandoned:
+                self.workers.remove(worker)
+                # the worker may not have been replaced when it was abandoned
+                if self.running:
+                    self._start_workers()
+            # the item became due whilst it was running
+            if item in self.pending:
+                self.pending.discard(item)
+                self._dispatch(item)
+
+    def _dispatch(self, item):
+        """
+        Pass the item to the workers unless it is already queued or running.
+        The condition must be held.
+        """
+        if item in self.active:
+            self.pending.add(item)
+            return
+        # None shows that the item is queued but not yet running
+        self.active[item] = None
+        self.queue.put(item)
+        self.queue_depth_max = max(self.queue_depth_max, self.queue_depth())
+
+    def _start_workers(self):
+        """
+        Start new workers if fewer than worker_count are available, returns
+        the number that were available.  The condition must be held.
+        """
+        current = len([x for x in self.workers if not x.abandoned])
+        current -= self.exiting
+        for x in range(self.worker_count - current):
+            worker = Worker(self)
+            self.workers.append(worker)
+            worker.start()
+        return current
+
+    def _remove(self, item):
+        """
+        Mark the entry for an item as removed.  The entry will be discarded
+        when it reaches the top of the heap.  The condition must be held.
+        """
+        entry = self.entries.pop(item, None)
+        if entry:
+            entry[2] = None
+
+    def _check_timeouts(self, now):
+        """
+        Check for items that have been running for too long.  Returns the time
+        that we next need to check or None.  The condition must be held.
+        """
+        next_check = None
+        for item, info in list(self.active.items()):
+            timeout = getattr(item, 'run_timeout', None)
+            if not info or not timeout or info[1].abandoned:
+                continue
+            start, worker = info
+            if now - start < timeout:
+                if next_check is None or start + timeout < next_check:
+                    next_check = start + timeout
+                continue
+            # abandon the worker and replace it if we can
+            self.timeouts += 1
+            worker.abandoned = True
+            if len(self.workers) < self.max_workers:
+                worker = Worker(self)
+                self.workers.append(worker)
+                worker.start()
+            else:
+                self.py3_wrapper.log(
+                    'scheduler: worker limit reached, not replacing worker',
+                    'warning'
+                )
+            try:
+                item.run_timed_out()
+            except Exception:
+                msg = 'Timeout handling of `{}` failed'.format(item)
+                self.py3_wrapper.report_exception(msg, notify_user=False)
+        return next_check
+
+    def log_stats(self, now):
+        """
+        Log the number of wakeups per minute, and the number there would have
+        been without alignment, along with worker statistics then reset the
+        counts.
+        """
+        if self.py3_wrapper.config.get('debug'):
+            minutes = (now - self.stats_start) / 60.0
+            msg = 'scheduler: {:.1f} wakeups/min ({:.1f} without alignment)'
+            self.py3_wrapper.log(msg.format(
+                self.wakeups / minutes, self.wakeups_unaligned / minutes
+            ))
+            msg = ('scheduler: {} workers, max queue depth {}, '
+                   '{} runs timed out')
+            self.py3_wrapper.log(msg.format(
+                len(self.workers), self.queue_depth_max, self.timeouts
+            ))
+        self.queue_depth_max = 0
+        self.stats_start = now
+        self.timeouts = 0
+        self.wakeups = 0
+        self.wakeups_unaligned = 0
+
+    def run(self):
+        """
+        Wait until the next item is due and then pass it to the workers.
+        """
+        heap = self.heap
+        with self.condition:
+            while self.running:
+                now = time()
+                requested = set()
+                while heap and heap[0][0] <= now:
+                    entry = heapq.heappop(heap)
+                    item = entry[2]
+                    # entries for cancelled items are ignored
+                    if item is None:
+                        continue
+                    del self.entries[item]
+                    requested.add(entry[3])
+                    self._dispatch(item)
+                if requested:
+                    # without alignment we would have woken for each of the
+                    # different requested times
+                    self.wakeups += 1
+                    self.wakeups_unaligned += len(requested)
+                if now - self.stats_start >= STATS_INTERVAL:
+                    self.log_stats(now)
+                wake = self._check_timeouts(now)
+                if heap and (wake is None or heap[0][0] < wake):
+                    wake = heap[0][0]
+                if wake is None:
+                    self.condition.wait()
+                else:
+                    self.condition.wait(wake - now)
@@ -0,0 +1,109 @@
+"""
+Benchmark Formatter.format() using the cases from test_formatter.py
+
+    python tests/benchmark_formatter.py [repeat]
+
+This is not run as part of the tests.  Run it before and after a change to
+the formatter to compare them.  As well as the time taken, the memory
+allocated while rendering is measured using tracemalloc if available.
+"""
+import os
+import sys
+
+from timeit import default_timer as timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# use the py3status and tests in this checkout
+TESTS = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [TESTS, os.path.dirname(TESTS)]
+
+import test_formatter  # noqa: E402
+
+
+def get_cases():
+    """
+    Collect the arguments used by each formatter test.
+    """
+    cases = []
+
+    def collect(test_dict):
+        if test_dict.get('py3only') and test_formatter.f.python2:
+            return
+        if test_dict.get('exception'):
+            return
+        attr_getter = None
+        if test_dict.get('attr_getter'):
+            attr_getter = test_formatter.attr_getter_fn
+        cases.append((test_dict['format'], test_dict.get('composite'),
+                      attr_getter))
+
+    test_formatter.run_formatter = collect
+    for name in sorted(dir(test_formatter)):
+        if name.startswith('test_'):
+            getattr(test_formatter, name)()
+    return cases
+
+
+def benchmark(repeat):
+    cases = get_cases()
+    f = test_formatter.f
+    module = test_formatter.Module()
+    param_dict = test_formatter.param_dict
+    start = timer()
+    for x in range(repeat):
+        for format_string, composite, attr_getter in cases:
+            f.format(format_string, module, param_dict,
+                     force_composite=composite, attr_getter=attr_getter)
+    elapsed = timer() - start
+    renders = repeat * len(cases)
+    print('{} cases, {} renders in {:.3f}s, {:.1f}us per render'.format(
+        len(cases), renders, elapsed, elapsed / renders * 1e6
+    ))
+
+
+def benchmark_memory():
+    """
+    tracemalloc only knows about memory still in use so we measure the peak
+    memory in use while rendering each case, which is what it allocates.
+    """
+    if not tracemalloc:
+        return
+    cases = get_cases()
+    f = test_formatter.f
+    module = test_formatter.Module()
+    param_dict = test_formatter.param_dict
+    # make sure the format strings are already compiled
+    for format_string, composite, attr_getter in cases:
+        f.format(format_string, module, param_dict,
+                 force_composite=composite, attr_getter=attr_getter)
+    total = 0
+    for format_string, composite, attr_getter in cases:
+        tracemalloc.start()
+        f.format(format_string, module, param_dict,
+                 force_composite=composite, attr_getter=attr_getter)
+        total += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    print('{:.0f} bytes allocated per render'.format(total / len(cases)))
+
+
+def object_sizes():
+    """
+    Size of the objects made for each block of a format.
+    """
+    from py3status.formatter import Block, BlockConfig
+
+    for obj in [Block({}, None), BlockConfig()]:
+        size = sys.getsizeof(obj)
+        if hasattr(obj, '__dict__'):
+            size += sys.getsizeof(obj.__dict__)
+        print('{} {} bytes'.format(obj.__class__.__name__, size))
+
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
+    benchmark_memory()
+    object_sizes()
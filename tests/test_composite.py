@@ -83,3 +83,28 @@ def test_Composite_iadd_4():
     c += (Composite('moo'))
     result = c.get_content()
     assert result == [{'full_text': 'moo'}, {'full_text': 'moo'}]
+
+
+# Composite simplify
+
+
+def test_Composite_simplify_1():
+    items = [
+        {'full_text': 'a', 'color': '#FF0000'},
+        {'full_text': ' '},
+        {'full_text': 'b', 'color': '#FF0000'},
+        {'full_text': 'c'},
+        {'full_text': ''},
+    ]
+    result = Composite(items).simplify().get_content()
+    assert result == [{'full_text': 'a b', 'color': '#FF0000'},
+                      {'full_text': 'c'}]
+    # the items given are not changed
+    assert items[0] == {'full_text': 'a', 'color': '#FF0000'}
+
+
+def test_Composite_simplify_2():
+    items = [{'full_text': 'a'}, {'full_text': 'b'}]
+    result = Composite(items).simplify(copy=False).get_content()
+    assert result == [{'full_text': 'ab'}]
+    assert result[0] is items[0]
@@ -0,0 +1,213 @@
+import os
+
+from json import loads
+
+import py3status.core
+
+from py3status.core import Py3statusWrapper
+
+
+class Stub:
+    """
+    Accepts any method call.
+    """
+
+    mocked = True
+
+    def __getattr__(self, name):
+        return lambda *args, **kw: None
+
+
+class Module:
+
+    def __init__(self, container=False):
+        self.container = container
+        self.killed = False
+        self.started = False
+        self.unsuspended = False
+
+    def kill(self):
+        self.killed = True
+
+    def start_module(self, delay=0):
+        self.started = True
+
+    def unsuspend(self):
+        self.unsuspended = True
+
+
+def make_config(**modules):
+    config = {
+        'general': {},
+        'i3s_modules': [],
+        'order': sorted(modules),
+        'py3_modules': sorted(modules),
+        'py3status': {},
+        '.module_groups': {},
+    }
+    config.update(modules)
+    return config
+
+
+def make_wrapper(config):
+    wrapper = Py3statusWrapper()
+    wrapper.config = {
+        'i3status_config_path': 'config', 'py3_config': config,
+    }
+    wrapper.py3_modules = config['py3_modules']
+    wrapper.modules = dict((name, Module()) for name in config['py3_modules'])
+    wrapper.events_thread = Stub()
+    wrapper.i3status_thread = Stub()
+    wrapper.scheduler = Stub()
+    wrapper.log = Stub().log
+    wrapper.create_mappings = Stub().create_mappings
+    wrapper.create_output_modules = Stub().create_output_modules
+    wrapper.get_user_configured_modules = lambda: {}
+    wrapper.loaded = []
+
+    def load_modules(modules, user_modules):
+        wrapper.loaded.extend(modules)
+        for name in modules:
+            wrapper.modules[name] = Module()
+
+    wrapper.load_modules = load_modules
+    return wrapper
+
+
+def test_reload_config(monkeypatch):
+    old_config = make_config(
+        kept={'format': 'a'}, changed={'format': 'b'}, removed={},
+    )
+    new_config = make_config(
+        kept={'format': 'a'}, changed={'format': 'c'}, added={},
+    )
+    wrapper = make_wrapper(old_config)
+    modules = dict(wrapper.modules)
+    for name in wrapper.modules:
+        wrapper.output_cache[name] = ([], '')
+    monkeypatch.setattr(
+        py3status.core, 'process_config', lambda path, wrapper: new_config
+    )
+    wrapper.reload_config()
+
+    assert wrapper.config['py3_config'] is new_config
+    assert wrapper.loaded == ['added', 'changed']
+    assert not modules['kept'].killed
+    assert modules['changed'].killed
+    assert modules['removed'].killed
+    assert wrapper.modules['kept'] is modules['kept']
+    assert wrapper.modules['added'].started
+    assert wrapper.modules['changed'].started
+    assert 'removed' not in wrapper.modules
+    # the cached output of removed and changed modules is dropped
+    assert sorted(wrapper.output_cache) == ['kept']
+
+
+def test_reload_config_unreadable(monkeypatch):
+    config = make_config(kept={})
+    wrapper = make_wrapper(config)
+    module = wrapper.modules['kept']
+    reported = []
+    wrapper.report_exception = lambda msg: reported.append(msg)
+
+    def process_config(path, wrapper):
+        raise IOError('No such file or directory')
+
+    monkeypatch.setattr(py3status.core, 'process_config', process_config)
+    wrapper.reload_config()
+
+    # the current config and modules are kept
+    assert reported
+    assert wrapper.config['py3_config'] is config
+    assert wrapper.modules == {'kept': module}
+    assert not module.killed
+
+
+def make_containers():
+    """
+    A group showing either a frame or a module, the frame holds a module.
+    """
+    config = make_config(**{
+        'group outer': {}, 'frame inner': {}, 'other': {}, 'leaf': {},
+    })
+    config['.module_groups'] = {
+        'frame inner': ['group outer'],
+        'other': ['group outer'],
+        'leaf': ['frame inner'],
+    }
+    wrapper = make_wrapper(config)
+    wrapper.modules['group outer'] = Module(container=True)
+    wrapper.modules['frame inner'] = Module(container=True)
+    content = {'group outer': set(['other']), 'frame inner': set(['leaf'])}
+    wrapper.output_modules = dict(
+        (name, {'content_function': lambda name=name: content[name]})
+        for name in content
+    )
+    return wrapper, content
+
+
+def test_is_module_visible():
+    wrapper, content = make_containers()
+    assert wrapper.is_module_visible('group outer')
+    assert wrapper.is_module_visible('other')
+    assert not wrapper.is_module_visible('frame inner')
+    # the frame holds the module but is itself hidden
+    assert not wrapper.is_module_visible('leaf')
+
+    content['group outer'] = set(['frame inner'])
+    assert not wrapper.is_module_visible('other')
+    assert wrapper.is_module_visible('frame inner')
+    assert wrapper.is_module_visible('leaf')
+
+    # a closed frame shows nothing
+    content['frame inner'] = set()
+    assert wrapper.is_module_visible('frame inner')
+    assert not wrapper.is_module_visible('leaf')
+
+
+def test_unsuspend_on_group_switch():
+    wrapper, content = make_containers()
+    wrapper.py3_modules_initialized = True
+    content['group outer'] = set(['frame inner'])
+    wrapper.notify_update('group outer')
+
+    # the frame and the module it holds are now shown
+    assert wrapper.modules['frame inner'].unsuspended
+    assert wrapper.modules['leaf'].unsuspended
+    assert not wrapper.modules['other'].unsuspended
+
+
+def test_include_path_index(tmpdir):
+    wrapper = Py3statusWrapper()
+    path = str(tmpdir)
+    tmpdir.join('one.py').write('')
+    tmpdir.join('notes.txt').write('')
+    os.utime(path, (1000, 1000))
+    assert wrapper.get_include_path_files(path) == ['one.py']
+
+    # the directory is only listed again once its mtime changes
+    tmpdir.join('two.py').write('')
+    os.utime(path, (1000, 1000))
+    assert wrapper.get_include_path_files(path) == ['one.py']
+    os.utime(path, (2000, 2000))
+    assert wrapper.get_include_path_files(path) == ['one.py', 'two.py']
+
+
+def test_process_module_output():
+    wrapper = Py3statusWrapper()
+    wrapper.mappings_color = {'b': '#FF0000'}
+    a = [{'full_text': 'a', 'name': 'a'}]
+    b = [{'full_text': 'b', 'name': 'b'}]
+    fragment_a = wrapper.process_module_output('a', a)
+    fragment_b = wrapper.process_module_output('b', b)
+    assert loads(fragment_a) == a[0]
+    assert loads(fragment_b)['color'] == '#FF0000'
+    assert 'color' not in b[0]
+
+    # unchanged output reuses the cached fragment
+    assert wrapper.process_module_output('a', a) is fragment_a
+
+    # a module changing its output in place only invalidates its fragment
+    a[0]['full_text'] = 'changed'
+    assert loads(wrapper.process_module_output('a', a)) == a[0]
+    assert wrapper.process_module_output('b', b) is fragment_b
@@ -0,0 +1,95 @@
+import sys
+import pytest
+
+from threading import Event
+
+from py3status.event_loop import CoroutineTimeout, EventLoop
+
+asyncio = pytest.importorskip('asyncio')
+
+# coroutine methods and loop.create_future() need python 3.5.2+
+pytestmark = pytest.mark.skipif(
+    sys.version_info < (3, 5, 2), reason='requires python 3.5.2+'
+)
+
+
+class Wrapper:
+    config = {}
+
+
+def run_coroutines(coroutines):
+    event_loop = EventLoop(Wrapper())
+    event_loop.start()
+    done = Event()
+    results = []
+
+    def callback(result):
+        results.extend(result)
+        done.set()
+
+    run = event_loop.run_coroutines(coroutines, callback)
+    return event_loop, run, done, results
+
+
+def test_run_coroutines():
+    coroutines = [asyncio.sleep(0.01, result=1), asyncio.sleep(0, result=2)]
+    event_loop, run, done, results = run_coroutines(coroutines)
+    assert done.wait(2)
+    assert results == [1, 2]
+    event_loop.stop()
+
+
+def test_cancel():
+    event_loop, run, done, results = run_coroutines([asyncio.sleep(5)])
+    run.cancel()
+    assert not done.wait(0.2)
+    assert results == []
+    event_loop.stop()
+
+
+def test_command_output():
+    event_loop = EventLoop(Wrapper())
+    event_loop.start()
+    done = Event()
+    results = []
+
+    def check(output, error, retcode):
+        return output, error, retcode
+
+    def start():
+        # must be called from the event loop thread
+        future = event_loop.command_output(['echo', 'hello'], False, check)
+        future.add_done_callback(lambda f: (results.append(f.result()),
+                                            done.set()))
+
+    event_loop.loop.call_soon_threadsafe(start)
+    assert done.wait(2)
+    assert results == [('hello\n', '', 0)]
+    event_loop.stop()
+
+
+def test_timeout():
+    event_loop = EventLoop(Wrapper())
+    event_loop.start()
+    done = Event()
+    results = []
+
+    def callback(result):
+        results.extend(result)
+        done.set()
+
+    coroutines = [asyncio.sleep(0, result=1), asyncio.sleep(5)]
+    event_loop.run_coroutines(coroutines, callback, timeout=0.1)
+    assert done.wait(2)
+    assert results[0] == 1
+    assert isinstance(results[1], CoroutineTimeout)
+    event_loop.stop()
+
+
+def test_not_available(monkeypatch):
+    # without asyncio there is no event loop to start
+    monkeypatch.setattr(EventLoop, 'available', False)
+    event_loop = EventLoop(Wrapper())
+    event_loop.start()
+    assert not event_loop.is_alive()
+    event_loop.stop()
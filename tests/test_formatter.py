@@ -6,7 +6,7 @@ Run formatter tests
 import platform
 
 from py3status.composite import Composite
-from py3status.formatter import Formatter
+from py3status.formatter import Formatter, FormatCache
 
 is_pypy = platform.python_implementation() == 'PyPy'
 f = Formatter()
@@ -87,6 +87,16 @@ def run_formatter(test_dict):
     if hasattr(result, 'get_content'):
         result = result.get_content()
 
+    # memoized output must be the same both when made and when reused
+    memo = FormatCache()
+    for x in range(2):
+        memoized = f.format(test_dict['format'], module, param_dict,
+                            force_composite=test_dict.get('composite'),
+                            attr_getter=attr_getter, memo=memo)
+        if hasattr(memoized, 'get_content'):
+            memoized = memoized.get_content()
+        assert memoized == result
+
     expected = test_dict.get('expected')
     if f.python2 and isinstance(expected, str):
         expected = expected.decode('utf-8')
@@ -1012,3 +1022,58 @@ def test_not_zero_11():
         'format': '[\?not_zero {zero_str} {zero}]',
         'expected': '',
     })
+
+
+def test_format_cache():
+    cache = FormatCache(size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    # b is now the least recently used
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+    assert stats['evictions'] == 1
+    assert stats['size'] == 2
+
+
+def test_format_cache_bounded():
+    size = f.format_string_cache.size
+    f.set_cache_size(50)
+    try:
+        for i in range(1000):
+            f.format('{name} %s [{number}]' % i, param_dict=param_dict)
+        assert len(f.format_string_cache) == 50
+        assert len(f.compiled_cache) == 50
+        assert f.cache_stats()['compiled']['evictions'] >= 950
+    finally:
+        f.set_cache_size(size)
+
+
+def test_format_memo():
+    memo = FormatCache()
+    module = Module()
+    format_string = '[\?color=level {name}] {number}'
+    values = {'name': 'one', 'number': 1}
+    result = f.format(format_string, module, values, memo=memo)
+    assert result == 'one 1'
+    # changing the returned composite must not change the memoized one
+    module.color_level = '#FF0000'
+    result = f.format(format_string, module, values, memo=memo)
+    result.get_content()[0]['full_text'] = 'changed'
+    result = f.format(format_string, module, values, memo=memo)
+    assert result.get_content()[0] == {'full_text': 'one ', 'color': '#FF0000'}
+    assert memo.stats()['hits'] == 1
+    # True and 1 are shown differently
+    values['number'] = True
+    result = f.format(format_string, module, values, memo=memo)
+    assert result.get_content()[1]['full_text'] == 'True'
+    assert memo.stats()['misses'] == 3
+    # composites are not memoized
+    f.format('{complex}', module, param_dict, memo=memo)
+    f.format('{complex}', module, param_dict, memo=memo)
+    assert memo.stats()['misses'] == 3
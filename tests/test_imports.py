@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+# modules that should only be imported when they are needed
+DEFERRED = [
+    'pprint',
+    'py3status.autodoc',
+    'py3status.docstrings',
+    'py3status.event_loop',
+    'py3status.isolation',
+    'py3status.request',
+    'tempfile',
+    'traceback',
+    'urllib.request',
+    'urllib2',
+]
+
+CHECK = """
+import sys
+import py3status
+print(' '.join(sorted(sys.modules)))
+"""
+
+
+def test_deferred_imports():
+    # a fresh interpreter is needed as other tests import these modules
+    output = subprocess.check_output([sys.executable, '-c', CHECK])
+    imported = set(output.decode('utf-8').split())
+    assert imported & set(DEFERRED) == set()
@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from py3status.formatter import Formatter
+from py3status.isolation import IsolatedModule
+from py3status.py3 import ModuleErrorException
+
+
+class Wrapper:
+    def log(self, msg, level='info'):
+        pass
+
+
+class Instance:
+    count = 0
+
+    def pid(self):
+        return os.getpid()
+
+    def increment(self, amount):
+        self.count += amount
+        return self.count
+
+    def error(self):
+        raise ModuleErrorException('oops', 5)
+
+    def fail(self):
+        raise ValueError('bad value')
+
+    def format(self):
+        return Formatter().format('{count}', self)
+
+
+class Module:
+    config = {'debug': False}
+    module_full_name = 'test'
+
+    def __init__(self):
+        self._py3_wrapper = Wrapper()
+        self.module_class = Instance()
+
+
+def test_call():
+    module = Module()
+    isolated = IsolatedModule(module)
+    assert isolated.call('pid') != os.getpid()
+    # state is kept in the child
+    assert isolated.call('increment', 2) == 2
+    assert isolated.call('increment', 3) == 5
+    assert module.module_class.count == 0
+    isolated.stop()
+
+
+def test_errors():
+    isolated = IsolatedModule(Module())
+    with pytest.raises(ModuleErrorException) as e:
+        isolated.call('error')
+    assert (e.value.msg, e.value.timeout) == ('oops', 5)
+    with pytest.raises(Exception) as e:
+        isolated.call('fail')
+    assert str(e.value) == 'bad value'
+    isolated.stop()
+
+
+def test_restart():
+    isolated = IsolatedModule(Module())
+    pid = isolated.call('pid')
+    process = isolated.process
+    isolated.terminate()
+    process.join()
+    # a new process is started when needed
+    assert isolated.call('pid') != pid
+    isolated.stop()
+
+
+def test_locks_held_when_forked():
+    # a lock held by another thread when the child is forked is replaced
+    isolated = IsolatedModule(Module())
+    with Formatter.compiled_cache.lock:
+        assert isolated.call('format') == '0'
+    isolated.stop()
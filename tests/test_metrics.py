@@ -0,0 +1,58 @@
+import json
+
+from py3status.metrics import Histogram, Metrics, thread_time
+
+
+class Py3Wrapper:
+
+    def log(self, msg, level='info'):
+        pass
+
+
+def test_histogram():
+    histogram = Histogram()
+    for value in [0.0005, 0.001, 0.002, 0.3, 20]:
+        histogram.add(value)
+    result = histogram.as_dict()
+    assert result['buckets']['0.001'] == 2
+    assert result['buckets']['0.005'] == 1
+    assert result['buckets']['0.5'] == 1
+    assert result['buckets']['inf'] == 1
+    assert result['max'] == 20
+    assert abs(result['mean'] - 20.3035 / 5) < 1e-9
+
+
+def test_record():
+    metrics = Metrics(Py3Wrapper())
+    metrics.record_call('mod', 'update', 0.002, 0.001)
+    metrics.record_call('mod', 'update', 0.003, None, error=True)
+    metrics.record_update('mod', True)
+    metrics.record_update('mod', False)
+    metrics.record_update('mod', False)
+    metrics.record_update('mod', True)
+
+    result = metrics.get('mod')
+    method = result['methods']['update']
+    assert method['calls'] == 2
+    assert method['errors'] == 1
+    assert method['error_rate'] == 0.5
+    assert method['last_call']
+    assert method['wall_time']['buckets']['0.005'] == 2
+    if thread_time:
+        assert method['cpu_time']['buckets']['0.001'] == 1
+    assert result['updates'] == 4
+    assert result['change_ratio'] == 0.5
+
+    assert metrics.get('other') is None
+    metrics.remove('mod')
+    assert metrics.get()['modules'] == {}
+
+
+def test_dump(tmpdir):
+    metrics = Metrics(Py3Wrapper())
+    metrics.record_call('mod', 'update', 0.1, 0.1)
+    path = str(tmpdir.join('metrics', 'metrics.json'))
+    assert metrics.dump(path) == path
+    with open(path) as f:
+        data = json.load(f)
+    assert data['modules']['mod']['methods']['update']['calls'] == 1
@@ -0,0 +1,132 @@
+import sys
+import pytest
+
+from threading import Event
+from time import time
+
+from py3status.module import Module, load_source
+
+
+class AdaptiveModule:
+    adaptive_cache_time = Module.__dict__['adaptive_cache_time']
+
+    def __init__(self):
+        self.adaptive_polling_max = 60
+        self.backoff = 1
+        self.config = {'minimum_interval': 0.1}
+        self.output_changed = False
+
+
+def test_adaptive_cache_time():
+    module = AdaptiveModule()
+    intervals = []
+    for x in range(10):
+        intervals.append(module.adaptive_cache_time(time() + 5) - time())
+    # doubles until adaptive_polling_max is reached
+    expected = [10, 20, 40, 60, 60, 60, 60, 60, 60, 60]
+    assert all(abs(a - b) < 0.1 for a, b in zip(intervals, expected))
+    assert module.backoff == 16
+    # a change returns us to the normal interval
+    module.output_changed = True
+    cache_time = time() + 5
+    assert module.adaptive_cache_time(cache_time) == cache_time
+    assert module.backoff == 1
+
+
+def test_adaptive_cache_time_already_due():
+    # eg cache_timeout = 0
+    module = AdaptiveModule()
+    for x in range(2000):
+        cache_time = module.adaptive_cache_time(time() - 1)
+    assert cache_time <= time() + 60
+    assert module.backoff == 1024
+
+
+class Wrapper:
+
+    def __init__(self):
+        self.output_cache = {}
+
+    def log(self, msg, level='info'):
+        pass
+
+
+class SuspendModule:
+    suspend = Module.__dict__['suspend']
+
+    def __init__(self):
+        self._py3_wrapper = Wrapper()
+        self.config = {'debug': True}
+        self.module_full_name = 'hidden'
+        self.suspended = False
+
+
+def test_suspend():
+    module = SuspendModule()
+    module._py3_wrapper.output_cache = {'hidden': ([], ''), 'shown': ([], '')}
+    module.suspend()
+    assert module.suspended
+    # the cached output of the suspended module is dropped
+    assert list(module._py3_wrapper.output_cache) == ['shown']
+
+
+class AsyncModule:
+    start_async_methods = Module.__dict__['start_async_methods']
+
+    def __init__(self, event_loop):
+        self.async_methods = set(['status'])
+        self.async_results = None
+        self.async_run = None
+        self.event_loop = event_loop
+        self.methods = {'status': {'cached_until': 0}}
+        self.module_full_name = 'async'
+        self.module_timeout = 5
+        self.scheduled = Event()
+        self.scheduler = self
+
+    def call_method(self, meth):
+        import asyncio
+        return asyncio.sleep(0, result={'full_text': 'done'})
+
+    def schedule(self, module):
+        self.scheduled.set()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5, 2), reason='needs asyncio')
+def test_start_async_methods_immediate():
+    from py3status.event_loop import EventLoop
+
+    event_loop = EventLoop(None)
+    event_loop.start()
+    module = AsyncModule(event_loop)
+    # the coroutine can complete before run_coroutines() returns, the run
+    # must not be left behind as the module would never run again.
+    for x in range(500):
+        module.scheduled.clear()
+        assert module.start_async_methods()
+        assert module.scheduled.wait(2)
+        assert module.async_run is None
+        assert module.async_results == {'status': {'full_text': 'done'}}
+        module.async_results = None
+    event_loop.stop()
+
+
+def test_load_from_file(tmpdir):
+    path = tmpdir.join('py3status_test_user_module.py')
+    path.write('class Py3status:\n    loaded = True\n')
+    module = Module.load_from_file(str(path))
+    assert module.loaded
+    py_mod = sys.modules.pop('py3status_test_user_module')
+    if sys.version_info >= (3, 5):
+        # loaded with importlib
+        assert type(py_mod.__loader__).__name__ == 'SourceFileLoader'
+
+
+@pytest.mark.skipif(sys.version_info < (3, 5), reason='uses importlib')
+def test_load_source_error(tmpdir):
+    path = tmpdir.join('py3status_test_broken_module.py')
+    path.write('raise ValueError("broken")\n')
+    with pytest.raises(ValueError):
+        load_source('py3status_test_broken_module', str(path))
+    # the partly initialised module is not left behind
+    assert 'py3status_test_broken_module' not in sys.modules
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import os
+
+from py3status.parse_config import (
+    config_cache_path, decode_config, process_config
+)
+
+CONFIG = '''
+order += "static_string"
+static_string {
+    format = "hello"
+}
+'''
+
+
+def write_config(tmpdir, content):
+    path = tmpdir.join('config')
+    path.write(content)
+    return str(path)
+
+
+def test_config_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+    path = write_config(tmpdir, CONFIG)
+    config = process_config(path)
+    assert os.path.exists(config_cache_path(path))
+    assert process_config(path) == config
+    # changing the config means the cache is not used
+    write_config(tmpdir, CONFIG.replace('hello', 'goodbye!'))
+    assert process_config(path)['static_string']['format'] == 'goodbye!'
+
+
+def test_config_cache_private(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+    path = write_config(tmpdir, CONFIG.replace('format', 'format:hide'))
+    process_config(path)
+    assert not os.path.exists(config_cache_path(path))
+
+
+def test_config_cache_errors(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+    path = write_config(tmpdir, 'static_string {')
+    process_config(path)
+    assert not os.path.exists(config_cache_path(path))
+
+
+def test_decode_config():
+    text = u'static_string {\n    format = "h\xe9llo ☃"\n}\n'
+    for encoding in ['utf-8', 'utf-8-sig', 'utf-16', 'utf-32']:
+        assert decode_config(text.encode(encoding)) == text
+    # not valid utf-8
+    assert decode_config(u'caf\xe9'.encode('latin-1')) == u'caf\xe9'
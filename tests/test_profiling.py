@@ -0,0 +1,108 @@
+import os
+import pstats
+import sys
+import time
+
+from threading import Thread
+
+from py3status.profiling import Profiler
+
+
+class Py3Wrapper:
+
+    def __init__(self):
+        self.logs = []
+
+    def log(self, msg, level='info'):
+        self.logs.append(msg)
+
+
+def busy(count):
+    return sum(range(count))
+
+
+def idle():
+    return None
+
+
+def test_profiler(tmpdir):
+    py3_wrapper = Py3Wrapper()
+    profiler = Profiler(py3_wrapper, directory=str(tmpdir))
+
+    # nothing is profiled until profiling is turned on
+    assert profiler.run('busy', busy, 10) == 45
+    assert profiler.stats == {}
+
+    profiler.toggle()
+    assert profiler.enabled
+    for x in range(3):
+        assert profiler.run('busy', busy, 100000) == 4999950000
+    assert profiler.run('idle', idle) is None
+    assert profiler.runs == {'busy': 3, 'idle': 1}
+
+    path = profiler.stop()
+    assert not profiler.enabled
+    assert profiler.stats == {}
+    assert os.path.dirname(path) == str(tmpdir)
+
+    # the combined results include all modules
+    functions = [x[2] for x in pstats.Stats(path).stats]
+    assert 'busy' in functions
+    assert 'idle' in functions
+
+    # the summary of the busiest module is logged first
+    summaries = [x for x in py3_wrapper.logs if x.startswith('profile of')]
+    assert summaries[0].startswith('profile of module busy: 3 runs')
+    assert summaries[1].startswith('profile of module idle: 1 runs')
+
+
+def test_profiler_nothing_run(tmpdir):
+    py3_wrapper = Py3Wrapper()
+    profiler = Profiler(py3_wrapper, directory=str(tmpdir))
+    profiler.toggle()
+    profiler.toggle()
+    assert tmpdir.listdir() == []
+    assert py3_wrapper.logs[-1] == 'profiling stopped, no modules were run'
+
+
+def test_profiler_exception(tmpdir):
+    profiler = Profiler(Py3Wrapper(), directory=str(tmpdir))
+    profiler.start()
+
+    def fail():
+        raise ValueError('failed')
+
+    try:
+        profiler.run('fail', fail)
+    except ValueError:
+        pass
+    assert profiler.runs == {'fail': 1}
+
+
+def test_profiler_threads(tmpdir):
+    # a slow module being profiled does not hold up other modules
+    profiler = Profiler(Py3Wrapper(), directory=str(tmpdir))
+    profiler.start()
+    finished = []
+
+    def sleepy():
+        time.sleep(0.5)
+        finished.append('sleepy')
+
+    def quick():
+        finished.append('quick')
+
+    thread = Thread(target=profiler.run, args=('sleepy', sleepy))
+    thread.start()
+    time.sleep(0.1)
+    start = time.time()
+    profiler.run('quick', quick)
+    assert time.time() - start < 0.2
+    thread.join()
+    assert finished == ['quick', 'sleepy']
+    # since Python 3.12 only one run can be profiled at a time
+    assert sum(profiler.runs.values()) + profiler.skipped == 2
+    if sys.version_info < (3, 12):
+        assert profiler.runs == {'quick': 1, 'sleepy': 1}
+        functions = [x[2] for x in profiler.stats['quick'].stats]
+        assert 'sleepy' not in functions
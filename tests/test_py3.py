@@ -67,3 +67,21 @@ def test_format_units():
         # we use repr in the assert to ensure 1 and 1.0 are not treated the
         # same
         assert repr(py3.format_units(**test[0])) == repr(test[1])
+
+
+def test_placeholders_used():
+
+    class Module:
+        format = '{name} [{value:.1f}|{other}]'
+        format_tooltip = '\\?color=bad {tooltip}'
+        format_time = '%H:%M'
+        formats = ['{not_a_format}']
+
+    py3 = Py3(py3status=Module())
+    assert py3.placeholders_used() == frozenset(
+        ['name', 'other', 'tooltip', 'value']
+    )
+    assert py3.format_contains(Module.format, 'value')
+    assert py3.format_contains(Module.format, 'val*')
+    assert not py3.format_contains(Module.format, 'val')
+    assert not py3.format_contains(Module.format, 'tooltip')
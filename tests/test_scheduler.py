@@ -0,0 +1,162 @@
+from threading import Event
+from time import sleep, time
+
+from py3status.scheduler import Scheduler
+
+
+class Wrapper:
+    config = {}
+
+    def log(self, msg, level='info'):
+        pass
+
+    def report_exception(self, msg, notify_user=True):
+        pass
+
+
+class Item:
+    def __init__(self):
+        self.event = Event()
+        self.runs = 0
+
+    def run(self):
+        self.runs += 1
+        self.event.set()
+
+
+def test_schedule():
+    scheduler = Scheduler(Wrapper(), workers=2)
+    scheduler.start()
+    item = Item()
+    scheduler.schedule(item, time() + 0.05)
+    assert item.event.wait(2)
+    assert item.runs == 1
+    scheduler.stop()
+
+
+def test_reschedule():
+    scheduler = Scheduler(Wrapper(), workers=2)
+    scheduler.start()
+    item = Item()
+    scheduler.schedule(item, time() + 60)
+    # rescheduling replaces the existing entry
+    scheduler.schedule(item)
+    assert item.event.wait(2)
+    assert item.runs == 1
+    assert item not in scheduler.entries
+    scheduler.stop()
+
+
+def test_cancel():
+    scheduler = Scheduler(Wrapper(), workers=2)
+    scheduler.start()
+    item = Item()
+    scheduler.schedule(item, time() + 0.05)
+    scheduler.cancel(item)
+    assert not item.event.wait(0.2)
+    assert item.runs == 0
+    scheduler.stop()
+
+
+def test_alignment():
+    scheduler = Scheduler(Wrapper(), workers=1, slack=0.5)
+    item = Item()
+    due = time() + 10.1
+    scheduler.schedule(item, due)
+    aligned = scheduler.entries[item][0]
+    assert due <= aligned < due + 0.5
+    assert abs(aligned * 2 - round(aligned * 2)) < 1e-6
+    # items due within the slack period are not delayed
+    due = time() + 0.1
+    scheduler.schedule(item, due)
+    assert scheduler.entries[item][0] == due
+    # alignment can be turned off
+    due = time() + 10.1
+    scheduler.schedule(item, due, align=False)
+    assert scheduler.entries[item][0] == due
+
+
+class SlowItem:
+    def __init__(self, duration, run_timeout=None):
+        self.duration = duration
+        self.release = Event()
+        self.run_timeout = run_timeout
+        self.runs = 0
+        self.timed_out = Event()
+
+    def run(self):
+        self.runs += 1
+        self.release.wait(self.duration)
+
+    def run_timed_out(self):
+        self.timed_out.set()
+
+
+def test_single_run():
+    scheduler = Scheduler(Wrapper(), workers=4)
+    scheduler.start()
+    item = SlowItem(2)
+    scheduler.schedule(item)
+    sleep(0.1)
+    # becoming due whilst running does not start a second run
+    scheduler.schedule(item)
+    sleep(0.1)
+    assert item.runs == 1
+    assert item in scheduler.pending
+    item.release.set()
+    sleep(0.1)
+    assert item.runs == 2
+    scheduler.stop()
+
+
+def test_timeout():
+    scheduler = Scheduler(Wrapper(), workers=1)
+    scheduler.start()
+    slow = SlowItem(5, run_timeout=0.1)
+    scheduler.schedule(slow)
+    assert slow.timed_out.wait(2)
+    # the abandoned worker is replaced so other items still run
+    item = Item()
+    scheduler.schedule(item)
+    assert item.event.wait(2)
+    assert len(scheduler.workers) == 2
+    slow.release.set()
+    sleep(0.1)
+    assert len(scheduler.workers) == 1
+    scheduler.stop()
+
+
+def test_timeout_worker_limit():
+    scheduler = Scheduler(Wrapper(), workers=1)
+    scheduler.max_workers = 1
+    scheduler.start()
+    # slow items that do finish must not shrink the pool, although their
+    # workers cannot be replaced straight away.
+    items = [SlowItem(0.3, run_timeout=0.1) for x in range(3)]
+    for slow in items:
+        scheduler.schedule(slow)
+    for slow in items:
+        assert slow.timed_out.wait(2)
+    sleep(0.4)
+    assert len(scheduler.workers) == 1
+    item = Item()
+    scheduler.schedule(item)
+    assert item.event.wait(2)
+    scheduler.stop()
+
+
+def test_configure():
+    scheduler = Scheduler(Wrapper(), workers=2)
+    scheduler.start()
+    scheduler.configure(workers=4, slack=2)
+    assert len(scheduler.workers) == 4
+    assert scheduler.slack == 2
+    scheduler.configure(workers=1)
+    sleep(0.1)
+    assert len(scheduler.workers) == 1
+    assert scheduler.workers[0].is_alive()
+    # the remaining worker still runs items
+    item = Item()
+    scheduler.schedule(item)
+    assert item.event.wait(2)
+    scheduler.stop()